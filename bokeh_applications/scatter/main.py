@@ -17,8 +17,7 @@ import bokeh.models
 # ----------------------------------------------------------------------------
 # ChemMD imports
 # ----------------------------------------------------------------------------
-import chemmd.io.input
-import chemmd.io.output
+import chemmd.io
 from chemmd.display import helpers
 from chemmd.display.views.generic_table import table_layout
 from chemmd.display.views.generic_cross_filter_scatter import scatter_layout
@@ -60,8 +59,12 @@ except FileNotFoundError as not_found:
     raise FileNotFoundError
 
 try:
-    # Create the ChemMD data model objects.
-    nodes = chemmd.io.input.create_nodes_from_files(json_file_paths)
+    # Create the ChemMD data model objects and prepare them for Bokeh.
+    # Sessions opened on the same files and groups share a cached result.
+    main_df, metadata_df, metadata_dict = chemmd.io.prepare_files_for_bokeh(
+        groups["x_groups"],
+        groups["y_groups"],
+        json_file_paths)
 
 except FileNotFoundError as not_found:
     # Log the error.
@@ -73,19 +76,26 @@ except FileNotFoundError as not_found:
     print(f"The a data .csv file could not be found!")
     raise FileNotFoundError
 
-try:
-    # Prepare those created nodes for Bokeh.
-    main_df, metadata_df, metadata_dict = chemmd.io.output.prepare_nodes_for_bokeh(
-        groups["x_groups"],
-        groups["y_groups"],
-        nodes)
-
 except Exception as error:
     # Log the error.
     logger.error(f"Unable to parse the data for display, "
                  f"due to {error}")
     raise error
 
+# ----------------------------------------------------------------------------
+# Render the metadata panels in the background, before any point is selected.
+# ----------------------------------------------------------------------------
+helpers.prerender_metadata(metadata_dict, bk.io.curdoc())
+
+# ----------------------------------------------------------------------------
+# Shared data source.
+#
+# A single copy of the data is sent to the browser and used by every tab,
+# each view adds the columns it displays. Selections are linked between
+# the tabs.
+# ----------------------------------------------------------------------------
+source = bk.models.ColumnDataSource(data=helpers.column_data(main_df, []))
+
 # ----------------------------------------------------------------------------
 # Table creation
 # ----------------------------------------------------------------------------
@@ -94,7 +104,8 @@ table = table_layout(
     groups["y_groups"],
     main_df,
     metadata_df,
-    metadata_dict)
+    metadata_dict,
+    source=source)
 table_panel = bk.models.Panel(child=table, title="Data Table")
 
 # ----------------------------------------------------------------------------
@@ -105,8 +116,9 @@ scatter = scatter_layout(
     groups["y_groups"],
     main_df,
     metadata_df,
-    metadata_dict)
-scatter_panel = bk.models.Panel(child=table, title="Scatter")
+    metadata_dict,
+    source=source)
+scatter_panel = bk.models.Panel(child=scatter, title="Scatter")
 
 # ----------------------------------------------------------------------------
 # Tab creation
@@ -7,6 +7,7 @@ import time
 import shutil
 import logging
 from chemmd import config
+from chemmd.display import export
 
 
 # ----------------------------------------------------------------------------
@@ -27,6 +28,9 @@ GROUP_QUERY = config["HTTP_GROUP_QUERY"]
 def on_session_destroyed(session_context):
     """If present, this function is called when a session is closed.
     """
+    # The exports of the session are no longer reachable.
+    export.forget_session(session_context.id)
+
     # Get the file path of the generated json files for this instance.
     args = session_context.request.arguments
     # Try to read and remove the file path.
@@ -17,8 +17,7 @@ import bokeh.models
 # ----------------------------------------------------------------------------
 # ChemMD imports
 # ----------------------------------------------------------------------------
-import chemmd.io.input
-import chemmd.io.output
+import chemmd.io
 from chemmd.display import helpers
 from chemmd.display.views.generic_table import table_layout
 
@@ -59,8 +58,12 @@ except FileNotFoundError as not_found:
     raise FileNotFoundError
 
 try:
-    # Create the ChemMD data model objects.
-    nodes = chemmd.io.input.create_nodes_from_files(json_file_paths)
+    # Create the ChemMD data model objects and prepare them for Bokeh.
+    # Sessions opened on the same files and groups share a cached result.
+    main_df, metadata_df, metadata_dict = chemmd.io.prepare_files_for_bokeh(
+        groups["x_groups"],
+        groups["y_groups"],
+        json_file_paths)
 
 except FileNotFoundError as not_found:
     # Log the error.
@@ -72,13 +75,6 @@ except FileNotFoundError as not_found:
     print(f"The a data .csv file could not be found!")
     raise FileNotFoundError
 
-try:
-    # Prepare those created nodes for Bokeh.
-    main_df, metadata_df, metadata_dict = chemmd.io.output.prepare_nodes_for_bokeh(
-        groups["x_groups"],
-        groups["y_groups"],
-        nodes)
-
 except Exception as error:
     # Log the error.
     logger.error(f"Unable to parse the data for display, "
@@ -7,13 +7,16 @@
 # The each of the lines after the options are an application directory.
 # These must be copied over in the Dockerfile for this script to find them.
 #
+# The applications are served by serve_apps.py, which takes the same
+# options as bokeh serve and also registers the data export handler.
+#
 
 echo "Checking the CHEMMD_CONFIG environment variable..."
 echo "$CHEMMD_CONFIG"
 
 if [ "$CHEMMD_CONFIG" == "TESTING" ]; then
     echo "Test configuration loaded. Starting test Bokeh server..."
-    bokeh serve\
+    python /opt/ChemMD/scripts/serve_apps.py\
       --port 5006\
       --use-xheaders\
       --address 0.0.0.0\
@@ -27,7 +30,7 @@ if [ "$CHEMMD_CONFIG" == "TESTING" ]; then
         tests/bokeh_tests/scatter_table_combo_test
 else
     echo "Starting production Bokeh server..."
-    bokeh serve\
+    python /opt/ChemMD/scripts/serve_apps.py\
       --port 5006\
       --use-xheaders\
       --address 0.0.0.0\
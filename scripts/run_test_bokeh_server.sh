@@ -1,6 +1,6 @@
 #!/usr/bin/env bash
 
-bokeh serve --show\
+python scripts/serve_apps.py --show\
   tests/bokeh_tests/table_test/ \
   tests/bokeh_tests/scatter_test/ \
   tests/bokeh_tests/scatter_table_combo_test/ \
@@ -0,0 +1,71 @@
+"""Serve the ChemMD Bokeh applications along with the data export handler.
+
+The ``bokeh serve`` command cannot register extra request handlers, so
+this script starts the same Bokeh server programmatically, with the
+``extra_patterns`` of ``chemmd.display.export``. Each application
+directory is served under its directory name, as with ``bokeh serve``.
+
+Usage::
+
+    python serve_apps.py --port 5006 --use-xheaders \\
+        --allow-websocket-origin localhost:8001 \\
+        /opt/bkapps/scatter /opt/bkapps/table
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+import argparse
+import logging
+import os
+
+from bokeh.application import Application
+from bokeh.application.handlers import DirectoryHandler
+from bokeh.server.server import Server
+
+from chemmd.display import export
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("applications", nargs="+",
+                        help="Bokeh application directories.")
+    parser.add_argument("--port", type=int, default=5006)
+    parser.add_argument("--address", default=None)
+    parser.add_argument("--use-xheaders", action="store_true")
+    parser.add_argument("--allow-websocket-origin", action="append",
+                        default=[])
+    parser.add_argument("--log-level", default="info",
+                        choices=["trace", "debug", "info", "warning",
+                                 "error", "critical"])
+    parser.add_argument("--show", action="store_true",
+                        help="Open the first application in a browser.")
+    args = parser.parse_args()
+
+    # Bokeh's "trace" level is below debug.
+    logging.basicConfig(level=5 if args.log_level == "trace"
+                        else args.log_level.upper())
+
+    applications = {
+        "/" + os.path.basename(os.path.normpath(path)):
+            Application(DirectoryHandler(filename=path))
+        for path in args.applications}
+
+    server = Server(applications,
+                    port=args.port,
+                    address=args.address,
+                    use_xheaders=args.use_xheaders,
+                    allow_websocket_origin=args.allow_websocket_origin,
+                    extra_patterns=export.extra_patterns())
+    server.start()
+    logger.info(f"Serving {list(applications)} on port {args.port}.")
+    if args.show:
+        server.io_loop.add_callback(server.show, next(iter(applications)))
+    server.io_loop.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,12 @@ with the environment variable ``CHEMMD_CONFIG``.
 +--------------------+-----------------------------------------------------+
 | LOG_LEVEL          | The verbosity of the logger.                        |
 +--------------------+-----------------------------------------------------+
+| SESSION_CACHE_BYTES| Memory budget of the shared session data cache.     |
++--------------------+-----------------------------------------------------+
+| RENDER_THREADS     | Threads used to pre-render metadata HTML.           |
++--------------------+-----------------------------------------------------+
+| FLOAT32_COLUMNS    | Store float columns as float32 where it is lossless.|
++--------------------+-----------------------------------------------------+
 
 """
 
@@ -0,0 +1,206 @@
+"""Point decimation for large scatter plots.
+
+These functions choose a subset of rows to be sent to the browser, such
+that each series keeps its visible features (peaks, edges and outliers)
+within a fixed point budget. The full data remains on the server, and a
+new subset is chosen when the visible x range changes.
+
+Two methods are provided:
+
++ ``lttb`` Largest-triangle-three-buckets, suited to spectra and other
+  series that are read along the x axis.
++ ``minmax`` The minimum and maximum y value of each x bin, an envelope
+  that never hides an extreme value.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports -- Standard Python modules
+# ----------------------------------------------------------------------------
+import logging
+from typing import Tuple
+
+# ----------------------------------------------------------------------------
+# Imports -- Data science imports.
+# ----------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------------
+# Local project imports.
+# ----------------------------------------------------------------------------
+from .. import io
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------------
+# Decimation Functions
+# ----------------------------------------------------------------------------
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Select points with the largest-triangle-three-buckets algorithm.
+
+    :param x: The x values, sorted in ascending order.
+    :param y: The y values.
+    :param threshold: The number of points to select.
+    :returns: The positions of the selected points, in ascending order.
+
+    """
+    size = len(x)
+    if threshold >= size:
+        return np.arange(size)
+    if threshold < 3:
+        # Too few points for a bucket, keep the endpoints within budget.
+        return np.array([0, size - 1], dtype=np.int64)[:max(threshold, 0)]
+
+    # The first and last points are always kept, the remaining points
+    # are split into equal buckets with one point selected from each.
+    every = (size - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = size - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+
+        # The average of the next bucket is the third triangle vertex.
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else size
+        average_x = x[stop:next_stop].mean()
+        average_y = y[stop:next_stop].mean()
+
+        areas = np.abs((x[previous] - average_x) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (average_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def min_max_envelope(x: np.ndarray, y: np.ndarray,
+                     threshold: int) -> np.ndarray:
+    """Select the minimum and maximum y value of each of ``threshold // 2``
+    equal width x bins.
+
+    A budget below two points cannot hold an envelope, ``lttb`` is used
+    in its place.
+
+    :param x: The x values.
+    :param y: The y values.
+    :param threshold: The number of points to select.
+    :returns: The positions of the selected points, in ascending order.
+
+    """
+    size = len(x)
+    if threshold >= size:
+        return np.arange(size)
+    if threshold < 2:
+        return lttb(x, y, threshold)
+
+    # Each bin contributes up to two points, so the bins are clamped to
+    # keep within the budget.
+    bins = threshold // 2
+
+    low, high = x.min(), x.max()
+    width = (high - low) / bins or 1.0
+    bin_index = np.minimum(((x - low) / width).astype(np.int64), bins - 1)
+
+    # Sort by bin then by y, the first and last entry of each bin are
+    # then its minimum and maximum.
+    order = np.lexsort((y, bin_index))
+    _, first = np.unique(bin_index[order], return_index=True)
+    last = np.append(first[1:], size) - 1
+
+    return np.unique(np.concatenate((order[first], order[last])))
+
+
+METHODS = {
+    "lttb": lttb,
+    "minmax": min_max_envelope,
+}
+
+
+def decimate(x: np.ndarray, y: np.ndarray, budget: int,
+             method: str = "lttb") -> np.ndarray:
+    """Reduce a single series to at most ``budget`` points.
+
+    :param x: The x values of the series.
+    :param y: The y values of the series.
+    :param budget: The maximum number of points to keep.
+    :param method: One of the keys of ``METHODS``.
+    :returns: The positions of the selected points, in ascending order.
+
+    """
+    if len(x) <= budget:
+        return np.arange(len(x))
+
+    order = np.argsort(x, kind="stable")
+    selected = METHODS[method](x[order], y[order], budget)
+    return np.sort(order[selected])
+
+
+def decimate_frame(data_frame: pd.DataFrame,
+                   x_column: str,
+                   y_column: str,
+                   budget: int,
+                   x_range: Tuple[float, float] = None,
+                   by: str = None,
+                   method: str = "lttb") -> np.ndarray:
+    """Choose the rows of a data frame to be displayed.
+
+    Rows outside of ``x_range`` or without an x or y value are left out.
+    If ``by`` is given, each of its values is a separate series and the
+    budget is shared evenly between them, never exceeding it in total.
+
+    :param data_frame: The full data frame.
+    :param x_column: The column on the x axis.
+    :param y_column: The column on the y axis.
+    :param budget: The maximum number of rows to keep.
+    :param x_range: An optional (start, end) tuple of the visible x range.
+    :param by: An optional discrete column that separates series.
+    :param method: One of the keys of ``METHODS``.
+    :returns: The row positions to be displayed, in ascending order.
+
+    """
+    x = data_frame[x_column].to_numpy(dtype=np.float64)
+    y = data_frame[y_column].to_numpy(dtype=np.float64)
+
+    is_visible = ~(np.isnan(x) | np.isnan(y))
+    if x_range is not None and None not in x_range:
+        start, end = sorted(x_range)
+        is_visible &= (x >= start) & (x <= end)
+    positions = np.flatnonzero(is_visible)
+
+    if by is None:
+        series_codes = np.zeros(len(positions), dtype=np.int64)
+        series_count = 1
+    else:
+        series_values = io.output.discrete_values(data_frame[by])
+        series_codes, uniques = pd.factorize(
+            series_values.to_numpy()[positions])
+        series_count = max(len(uniques), 1)
+
+    # The budget is shared evenly, the points left over go to the largest
+    # series. With more series than points, the smallest are left out.
+    series_budgets = np.full(series_count, budget // series_count)
+    # Rows without a series value have a code of -1, and are left out.
+    series_sizes = np.bincount(series_codes[series_codes >= 0],
+                               minlength=series_count)
+    series_budgets[np.argsort(-series_sizes, kind="stable")
+                   [:budget % series_count]] += 1
+
+    selected = []
+    for code in range(series_count):
+        series_positions = positions[series_codes == code]
+        kept = decimate(x[series_positions], y[series_positions],
+                        series_budgets[code], method=method)
+        selected.append(series_positions[kept])
+
+    selected = np.sort(np.concatenate(selected)) if selected \
+        else np.empty(0, dtype=np.int64)
+    logger.debug(f"Decimated {len(positions)} visible rows to "
+                 f"{len(selected)}.")
+    return selected
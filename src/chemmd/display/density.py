@@ -0,0 +1,161 @@
+"""Server-side density binning for very large point clouds.
+
+Rather than sending every point to the browser, the points are counted
+into a fixed grid of bins with ``numpy.histogramdd``. The grid is drawn as
+a single image, and re-binned whenever the visible range changes.
+
+If a discrete column is given, the points of each of its values are
+counted separately, and ``shade_categories`` mixes the category colours
+of each bin by their counts.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports -- Standard Python modules
+# ----------------------------------------------------------------------------
+import logging
+from typing import List, NamedTuple, Tuple
+
+# ----------------------------------------------------------------------------
+# Imports -- Data science imports.
+# ----------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------------
+# Local project imports.
+# ----------------------------------------------------------------------------
+from .. import io
+
+logger = logging.getLogger(__name__)
+
+
+class DensityGrid(NamedTuple):
+    counts: np.ndarray
+    """The point counts, with the shape ``(categories, y_bins, x_bins)``."""
+    x_range: Tuple[float, float]
+    """The (start, end) of the binned x values."""
+    y_range: Tuple[float, float]
+    """The (start, end) of the binned y values."""
+    categories: List
+    """The values of the discrete column, one per category of ``counts``.
+    This is ``[None]`` if no discrete column was given."""
+
+    @property
+    def total(self) -> np.ndarray:
+        """The point counts of every category, with the shape
+        ``(y_bins, x_bins)``."""
+        return self.counts.sum(axis=0)
+
+
+# ----------------------------------------------------------------------------
+# Binning Functions
+# ----------------------------------------------------------------------------
+def value_extent(values: np.ndarray) -> Tuple[float, float]:
+    """Find the (start, end) of the finite values of an array.
+
+    A single value, or none at all, is given a range of width one so that
+    it can still be binned.
+
+    """
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return 0.0, 1.0
+
+    start, end = float(finite.min()), float(finite.max())
+    if start == end:
+        return start - 0.5, end + 0.5
+    return start, end
+
+
+def bin_density(data_frame: pd.DataFrame,
+                x_column: str,
+                y_column: str,
+                bins: int = 200,
+                x_range: Tuple[float, float] = None,
+                y_range: Tuple[float, float] = None,
+                by: str = None) -> DensityGrid:
+    """Count the points of two columns into a grid of bins.
+
+    :param data_frame: The full data frame.
+    :param x_column: The column on the x axis.
+    :param y_column: The column on the y axis.
+    :param bins: The number of bins along each axis.
+    :param x_range: An optional (start, end) tuple of the visible x range.
+        Defaults to the extent of the x values.
+    :param y_range: An optional (start, end) tuple of the visible y range.
+        Defaults to the extent of the y values.
+    :param by: An optional discrete column, the points of each of its
+        values are counted separately.
+    :returns: A ``DensityGrid``.
+
+    """
+    x = data_frame[x_column].to_numpy(dtype=np.float64)
+    y = data_frame[y_column].to_numpy(dtype=np.float64)
+
+    if x_range is None or None in x_range:
+        x_range = value_extent(x)
+    if y_range is None or None in y_range:
+        y_range = value_extent(y)
+    x_range, y_range = tuple(sorted(x_range)), tuple(sorted(y_range))
+
+    if by is None:
+        codes = np.zeros(len(x), dtype=np.int64)
+        categories = [None]
+    else:
+        codes, categories = pd.factorize(
+            io.output.discrete_values(data_frame[by]))
+        categories = list(categories) or [None]
+
+    # Every category is counted by a single histogram, the category code
+    # is its first dimension. Points without a category (code -1) fall
+    # outside of its range and are not counted.
+    counts, _ = np.histogramdd(
+        (codes, y, x),
+        bins=(len(categories), bins, bins),
+        range=((-0.5, len(categories) - 0.5), y_range, x_range))
+
+    logger.debug(f"Binned {len(x)} points of {x_column}, {y_column} into "
+                 f"{len(categories)} categories.")
+    return DensityGrid(counts=counts, x_range=x_range, y_range=y_range,
+                       categories=categories)
+
+
+# ----------------------------------------------------------------------------
+# Shading Functions
+# ----------------------------------------------------------------------------
+def hex_to_rgb(colors: List[str]) -> np.ndarray:
+    """Convert a list of ``#rrggbb`` strings to an array of RGB values."""
+    return np.array([[int(color[index:index + 2], 16)
+                      for index in (1, 3, 5)]
+                     for color in colors], dtype=np.float64)
+
+
+def shade_categories(grid: DensityGrid, colors: List[str]) -> np.ndarray:
+    """Shade a grid by the counts of each category.
+
+    The colour of each bin is the mean of the category colours, weighted
+    by their counts. The opacity grows with the logarithm of the total
+    count, and empty bins are transparent.
+
+    :param grid: A ``DensityGrid`` from ``bin_density``.
+    :param colors: A ``#rrggbb`` colour for each category of the grid.
+    :returns: A ``(y_bins, x_bins)`` array of packed RGBA values, as used
+        by the bokeh ``image_rgba`` glyph.
+
+    """
+    total = grid.total
+    rgb = np.tensordot(grid.counts, hex_to_rgb(colors), axes=(0, 0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rgb = np.nan_to_num(rgb / total[..., np.newaxis])
+
+    log_total = np.log1p(total)
+    alpha = log_total / log_total.max() if log_total.max() > 0 \
+        else log_total
+    # Non-empty bins are given a minimum opacity so that they are seen.
+    alpha = np.where(total > 0, 0.2 + 0.8 * alpha, 0.0)
+
+    rgba = np.empty(total.shape + (4, ), dtype=np.uint8)
+    rgba[..., :3] = np.round(rgb)
+    rgba[..., 3] = np.round(alpha * 255)
+    return rgba.view(np.uint32).reshape(total.shape)
@@ -0,0 +1,296 @@
+"""Server-side export of session data.
+
+The data of a session is registered under a random token when its layout
+is built, and the ``ExportHandler`` serves it from the bokeh server as a
+chunked CSV or Parquet download::
+
+    /export/<token>.csv
+    /export/<token>.parquet?metadata=1
+
+The download is streamed from the server's copy of the data, so it does
+not depend on what has been sent to the browser, and does not block the
+session. The handler must be registered with the bokeh server through
+``extra_patterns``, see ``scripts/serve_apps.py``.
+
+Parquet exports require the optional ``pyarrow`` package.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports -- Standard Python modules
+# ----------------------------------------------------------------------------
+import logging
+import threading
+import uuid
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+# ----------------------------------------------------------------------------
+# Imports -- Data science and server imports.
+# ----------------------------------------------------------------------------
+import bokeh as bk
+import bokeh.document
+import bokeh.io
+import numpy as np
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+# ----------------------------------------------------------------------------
+# Local project imports.
+# ----------------------------------------------------------------------------
+from .. import io
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# Global Definitions
+# ----------------------------------------------------------------------------
+EXPORT_URL = "/export"
+"""The path under which exports are served."""
+
+CHUNK_ROWS = 50000
+"""The number of rows written to each chunk of an export."""
+
+METADATA_NAMES = {
+    "experiment": "name",
+    "sample": "sample_name",
+    "source": "source_name",
+}
+"""The attribute that names the model of each metadata level."""
+
+
+class SessionExport(NamedTuple):
+    session_id: str
+    """The id of the session that registered the export."""
+    main_df: pd.DataFrame
+    """The data of the session."""
+    metadata_df: io.MetadataTable
+    """The metadata codes of the session data."""
+    metadata: Dict
+    """The metadata dictionary of the session."""
+
+
+EXPORTS = {}
+"""Registered exports, keyed by token."""
+
+_EXPORTS_LOCK = threading.Lock()
+
+
+# ----------------------------------------------------------------------------
+# Registration Functions
+# ----------------------------------------------------------------------------
+def register_export(main_df: pd.DataFrame,
+                    metadata_df: io.MetadataTable,
+                    metadata: Dict,
+                    current_document: bk.document.Document = None) -> str:
+    """Register the data of a session for export.
+
+    :param main_df: The data of the session.
+    :param metadata_df: The metadata codes of the session data.
+    :param metadata: The metadata dictionary of the session.
+    :param current_document: The bokeh Document of the session. Defaults
+        to `bk.io.curdoc()`.
+    :returns: The URL of the export, without a file extension.
+
+    """
+    if current_document is None:
+        current_document = bk.io.curdoc()
+
+    session_context = current_document.session_context
+    session_id = session_context.id if session_context is not None else None
+
+    token = uuid.uuid4().hex
+    with _EXPORTS_LOCK:
+        EXPORTS[token] = SessionExport(session_id, main_df, metadata_df,
+                                       metadata)
+    logger.debug(f"Export registered for session {session_id}.")
+    return f"{EXPORT_URL}/{token}"
+
+
+def forget_session(session_id: str):
+    """Remove the exports of a closed session.
+
+    :param session_id: The id of the session.
+
+    """
+    with _EXPORTS_LOCK:
+        for token in [token for token, export in EXPORTS.items()
+                      if export.session_id == session_id]:
+            del EXPORTS[token]
+
+
+# ----------------------------------------------------------------------------
+# Export Functions
+# ----------------------------------------------------------------------------
+def flatten_metadata(metadata_df: io.MetadataTable,
+                     metadata: Dict,
+                     rows: slice) -> pd.DataFrame:
+    """Name the experiment, sample and source of each row.
+
+    Any column of a row with metadata gives the same experiment, the
+    first such column is used.
+
+    :param metadata_df: The metadata codes of the session data.
+    :param metadata: The metadata dictionary of the session.
+    :param rows: The rows to be named.
+    :returns: A data frame with a column per metadata level.
+
+    """
+    codes = metadata_df.codes.to_numpy()[rows]
+    has_code = codes >= 0
+    first = np.where(has_code.any(axis=1), has_code.argmax(axis=1), 0)
+    row_codes = codes[np.arange(len(codes)), first] if codes.size \
+        else np.full(len(codes), -1)
+
+    flat = {}
+    for level, attribute in METADATA_NAMES.items():
+        # Each distinct key is named once.
+        names = [getattr(metadata.get(key), attribute, None)
+                 for key in metadata_df.keys[level]] + [None]
+        flat[level] = np.asarray(names, dtype=object)[row_codes]
+
+    return pd.DataFrame(flat)
+
+
+def export_chunks(export: SessionExport,
+                  include_metadata: bool = False,
+                  chunk_rows: int = CHUNK_ROWS
+                  ) -> Iterator[pd.DataFrame]:
+    """Split the data of an export into frames of ``chunk_rows`` rows.
+
+    :param export: A registered ``SessionExport``.
+    :param include_metadata: Whether to add the named metadata columns.
+    :param chunk_rows: The number of rows per chunk.
+
+    """
+    for start in range(0, max(len(export.main_df), 1), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        chunk = export.main_df.iloc[rows].reset_index(drop=True)
+        if include_metadata:
+            chunk = pd.concat([chunk, flatten_metadata(
+                export.metadata_df, export.metadata, rows)], axis=1)
+        yield chunk
+
+
+def csv_chunks(export: SessionExport,
+               include_metadata: bool = False,
+               chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """Write the data of an export as CSV, a chunk at a time.
+
+    Discrete columns that hold lists (such as species) are joined into a
+    single field.
+
+    """
+    for index, chunk in enumerate(export_chunks(export, include_metadata,
+                                                chunk_rows)):
+        for column in chunk.columns[chunk.dtypes == object]:
+            chunk[column] = io.output.discrete_values(chunk[column])
+        yield chunk.to_csv(index=False, header=index == 0).encode("utf-8")
+
+
+def parquet_chunks(export: SessionExport,
+                   include_metadata: bool = False,
+                   chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """Write the data of an export as Parquet, a row group at a time.
+
+    :raises ImportError: If ``pyarrow`` is not installed.
+
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = ChunkSink()
+    writer = None
+    for chunk in export_chunks(export, include_metadata, chunk_rows):
+        for column in chunk.columns[chunk.dtypes == object]:
+            chunk[column] = io.output.discrete_values(chunk[column])
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"),
+                                      table.schema)
+        writer.write_table(table)
+        # Send what has been written so far.
+        yield sink.take()
+
+    writer.close()
+    yield sink.take()
+
+
+class ChunkSink:
+    """A write-only file that hands over its contents as they are
+    written, while reporting the position of the whole file."""
+
+    def __init__(self):
+        self.closed = False
+        self._parts = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        """Remove and return the data written since the last call."""
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+EXPORT_FORMATS = {
+    "csv": (csv_chunks, "text/csv; charset=utf-8"),
+    "parquet": (parquet_chunks, "application/octet-stream"),
+}
+"""The writer and content type of each export format."""
+
+
+# ----------------------------------------------------------------------------
+# Server Handler
+# ----------------------------------------------------------------------------
+class ExportHandler(tornado.web.RequestHandler):
+    """Stream a registered export as a file download."""
+
+    async def get(self, token: str, export_format: str):
+        with _EXPORTS_LOCK:
+            export = EXPORTS.get(token)
+        if export is None:
+            raise tornado.web.HTTPError(404)
+
+        writer, content_type = EXPORT_FORMATS[export_format]
+        include_metadata = self.get_argument("metadata", "0") == "1"
+
+        # Chunks are written by to_csv or the Parquet writer, which would
+        # block every session on the IOLoop, so they run in an executor.
+        io_loop = tornado.ioloop.IOLoop.current()
+        chunks = writer(export, include_metadata)
+        try:
+            chunk = await io_loop.run_in_executor(None, next, chunks, None)
+        except ImportError as error:
+            logger.error(error)
+            raise tornado.web.HTTPError(501, f"{export_format} export is "
+                                             f"not available.")
+
+        self.set_header("Content-Type", content_type)
+        self.set_header("Content-Disposition",
+                        f"attachment; filename=data.{export_format}")
+
+        # Each chunk is flushed to the client before the next is written,
+        # so neither the server nor the session waits on the whole file.
+        while chunk is not None:
+            self.write(chunk)
+            await self.flush()
+            chunk = await io_loop.run_in_executor(None, next, chunks, None)
+
+
+def extra_patterns() -> List[Tuple]:
+    """The URL patterns of the export handler, as given to the
+    ``extra_patterns`` of a ``bokeh.server.server.Server``."""
+    return [(EXPORT_URL + r"/([0-9a-f]+)\.(csv|parquet)", ExportHandler)]
@@ -9,16 +9,22 @@ by the ``io`` module.
 # ----------------------------------------------------------------------------
 # Imports -- Standard Python modules
 # ----------------------------------------------------------------------------
+import collections
+import concurrent.futures
 import glob
 import json
 import itertools
 import logging
 import os
-from typing import Dict, List, Tuple, Union
+import threading
+import weakref
+from typing import (Callable, Dict, Iterator, List, NamedTuple, Tuple,
+                    Union)
 
 # Bokeh imports
 import bokeh as bk
 import bokeh.document
+import bokeh.io
 import bokeh.layouts
 import bokeh.models
 import bokeh.palettes
@@ -46,6 +52,18 @@ HTTP_QUERY_STRING = config["HTTP_QUERY_STRING"]
 GROUP_QUERY = config["HTTP_GROUP_QUERY"]
 PALETTE = bk.palettes.Category10  # pylint: disable=maybe-no-member
 
+# Rendered metadata HTML, keyed by model uuid.
+METADATA_HTML_CACHE_SIZE = 4096
+METADATA_HTML_CACHE = collections.OrderedDict()
+_METADATA_HTML_LOCK = threading.Lock()
+
+# Metadata HTML is pre-rendered by a shared pool of threads, into a store
+# for each session document.
+RENDER_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=config["RENDER_THREADS"],
+    thread_name_prefix="metadata_render")
+METADATA_STORES = weakref.WeakKeyDictionary()
+
 
 # ----------------------------------------------------------------------------
 # HTML Session API
@@ -108,7 +126,7 @@ def load_session_data(x_groups: QueryGroup,
                       y_groups: QueryGroup,
                       current_document: bk.document.Document
                       ) -> Tuple[bk.models.ColumnDataSource,
-                                 pd.DataFrame,
+                                 io.MetadataTable,
                                  dict]:
     """Load data for a document instance based on the provided query groups.
 
@@ -119,13 +137,20 @@ def load_session_data(x_groups: QueryGroup,
     # Find the paths based on the session context.
     json_paths = get_session_json_paths(current_document)
 
-    # Build Node models from each of the found json files.
-    nodes = io.create_nodes_from_files(json_paths)
+    # Combine the nodes of these files into a single set of data and
+    # metadata based on the user-supplied query groups. Sessions opened
+    # on the same files and groups share a cached result.
+    data, data_metadata, cds_metadata = io.prepare_files_for_bokeh(
+        x_groups=x_groups, y_groups=y_groups, json_paths=json_paths)
 
-    # Combine these nodes into a single set of data and metadata
-    # based on the user-supplied query groups.
-    data, data_metadata, cds_metadata = io.prepare_nodes_for_bokeh(
-        x_groups=x_groups, y_groups=y_groups, nodes=nodes)
+    # Render the metadata of the session in the background, so that it is
+    # ready before any point is selected.
+    prerender_metadata(cds_metadata, current_document)
+
+    # Sort the continuous columns once, for range selections.
+    sorted_columns(data, [column for column, profile in
+                          io.column_profile(data).items()
+                          if profile.dtype_class == "continuous"])
 
     # Build a Bokeh column data source object.
     source = bk.models.ColumnDataSource(data)
@@ -141,7 +166,8 @@ def load_session_data(x_groups: QueryGroup,
 
 def categorize_columns(data_frame: pd.DataFrame,
                        x_groups: QueryGroup,
-                       y_groups: QueryGroup
+                       y_groups: QueryGroup,
+                       profile: Dict[str, io.ColumnProfile] = None
                        ) -> dict:
     """Helper function for categorizing user-group defined columns.
 
@@ -151,6 +177,8 @@ def categorize_columns(data_frame: pd.DataFrame,
     :param data_frame:
     :param x_groups:
     :param y_groups:
+    :param profile: The column profiles of ``data_frame``, see
+        ``io.column_profile``. These are looked up if not given.
 
     :returns:
 
@@ -167,9 +195,12 @@ def categorize_columns(data_frame: pd.DataFrame,
     columns = sorted(data_frame.columns)
     columns = [x for x in columns if x in group_keys]
 
+    if profile is None:
+        profile = io.column_profile(data_frame, columns)
+
     # Discrete objects (strings and the like).
     discrete = [x for x in columns
-                if data_frame[x].dtype == object
+                if profile[x].dtype_class == "discrete"
                 and x in x_keys]
 
     # Continuous values only should remain.
@@ -180,7 +211,7 @@ def categorize_columns(data_frame: pd.DataFrame,
     # Some of the continuous values may make more sense to bin
     # if there are few enough unique values.
     quantileable = [x for x in continuous
-                    if len(data_frame[x].unique()) < 10
+                    if profile[x].cardinality < 10
                     and x in x_keys]
 
     logger.info(f"Columns categorized: {columns}")
@@ -204,6 +235,10 @@ def create_derived_column(data_frame: pd.DataFrame,
                           ) -> pd.DataFrame:
     """Calculate a column based on those already present in the data frame.
 
+    The derived group may give either a callable, which is called with
+    each precursor column as an array, or an expression string (see
+    ``chemmd.io.expressions``).
+
     :param data_frame:
     :param derived_group:
     :returns: A modified data_frame with the new column.
@@ -213,10 +248,19 @@ def create_derived_column(data_frame: pd.DataFrame,
     # Extract the column names and the callable from the derived group.
     new_column, precursor_columns, group_function = derived_group
 
-    precursor_columns = data_frame[list(precursor_columns)].T.values
-    # Apply the calculation with the precursor columns, and save the
-    # result to the given data frame.
-    data_frame[new_column] = group_function(*precursor_columns)
+    if isinstance(group_function, str):
+        # Expressions are compiled once and their results cached.
+        data_frame[new_column] = io.expressions.evaluate_expression(
+            group_function, data_frame)
+
+    else:
+        # Each column is read as its own array, rather than transposing
+        # (and so copying) the whole block of precursor columns.
+        precursor_columns = [data_frame[column].to_numpy()
+                             for column in precursor_columns]
+        # Apply the calculation with the precursor columns, and save the
+        # result to the given data frame.
+        data_frame[new_column] = group_function(*precursor_columns)
 
     logger.info(f"Derived column created: {new_column}")
 
@@ -228,18 +272,432 @@ def create_derived_column(data_frame: pd.DataFrame,
 # ----------------------------------------------------------------------------
 
 
-def get_metadata_keys(metadata_df: pd.DataFrame,
+def get_metadata_keys(metadata_df: io.MetadataTable,
                       index_selections: List[int]
-                      ):
+                      ) -> np.ndarray:
     """Returns a metadata row based on a list of index selections.
 
-    :param bokeh_source:
-    :param index_selections:
-    :param metadata_columns:
+    :param metadata_df: The ``MetadataTable`` of the session data.
+    :param index_selections: A list of selected row positions.
+    :return: An array of metadata key tuples, with a row per selection.
+    """
+
+    return metadata_df.resolve(index_selections)
+
+
+def column_data(data_frame: pd.DataFrame,
+                columns: List[str],
+                positions: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """Build the data of a ColumnDataSource from some of the columns of
+    a data frame.
+
+    As with ``ColumnDataSource.from_df``, an ``index`` column holds the
+    index of each row, so that rows of the source can be found in the
+    data frame.
+
+    :param data_frame: The full data frame.
+    :param columns: The columns to be sent to the browser.
+    :param positions: The row positions to be included. Defaults to
+        every row.
+    :return: A dictionary of ``{column_name: array}``.
+    """
+    if positions is None:
+        positions = slice(None)
+
+    data = {"index": data_frame.index.to_numpy()[positions]}
+    for column in columns:
+        data[column] = data_frame[column].to_numpy()[positions]
+    return data
+
+
+def project_columns(bokeh_source: bk.models.ColumnDataSource,
+                    data_frame: pd.DataFrame,
+                    columns: List[str]):
+    """Add the given columns to a source, if it does not hold them yet.
+
+    Only the rows already in the source are added, these are found by
+    its ``index`` column. Columns already in the source are not sent
+    again.
+
+    :param bokeh_source: A source built with ``column_data``.
+    :param data_frame: The full data frame.
+    :param columns: The columns that should be in the source.
+    """
+    missing = [column for column in columns
+               if column not in bokeh_source.data]
+    if not missing:
+        return
+
+    positions = data_frame.index.get_indexer(bokeh_source.data["index"])
+    bokeh_source.data.update(column_data(data_frame, missing, positions))
+    logger.debug(f"Columns added to the source: {missing}")
+
+
+def stream_batches(bokeh_source: bk.models.ColumnDataSource,
+                   metadata_df: io.MetadataTable,
+                   metadata: dict,
+                   batches: Iterator[Tuple[pd.DataFrame,
+                                           io.MetadataTable,
+                                           dict]],
+                   current_document: bk.document.Document = None,
+                   on_batch: Callable[[pd.DataFrame], None] = None):
+    """Append the remaining batches of ``io.stream_nodes_for_bokeh`` to a
+    source, one batch per tick of the document.
+
+    The first batch should already be displayed, each following batch is
+    only read once the previous one has been sent.
+
+    :param bokeh_source: The ColumnDataSource built from the first batch.
+    :param metadata_df: The metadata table of the first batch, it is
+        extended with the metadata of each batch.
+    :param metadata: The metadata dictionary of the first batch, it is
+        updated with the metadata of each batch.
+    :param batches: The iterator of remaining batches.
+    :param current_document: The bokeh Document to stream to. Defaults
+        to `bk.io.curdoc()`.
+    :param on_batch: An optional function called with the data frame of
+        each batch, once it has been streamed and its metadata added.
+
+    """
+    if current_document is None:
+        current_document = bk.io.curdoc()
+
+    def stream_next_batch():
+        try:
+            batch_df, batch_metadata, batch_entries = next(batches)
+        except StopIteration:
+            logger.info(f"Streamed all batches, {len(metadata_df)} rows.")
+            return
+
+        bokeh_source.stream(bk.models.ColumnDataSource.from_df(batch_df))
+        metadata_df.extend(batch_metadata)
+        metadata.update(batch_entries)
+        if on_batch is not None:
+            on_batch(batch_df)
+        logger.debug(f"Streamed a batch of {len(batch_df)} rows.")
+
+        current_document.add_next_tick_callback(stream_next_batch)
+
+    current_document.add_next_tick_callback(stream_next_batch)
+
+
+# ----------------------------------------------------------------------------
+# Range Selection
+# ----------------------------------------------------------------------------
+
+
+class SortedColumns:
+    """Sorted permutations of the columns of a data frame.
+
+    Each column is sorted once, after which the rows within a range of
+    values are found with a binary search, in O(log N + k) for k rows.
+    The permutations also give the sort order of paged tables.
+
+    Only a weak reference to the data frame is held, as the index is kept
+    in the ``frame_store`` of that same frame.
+
+    """
+
+    def __init__(self, data_frame: pd.DataFrame):
+        self._data_frame = weakref.ref(data_frame)
+        self._orders = {}
+        self._present = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @property
+    def data_frame(self) -> pd.DataFrame:
+        """The indexed data frame.
+
+        :raises ReferenceError: If the data frame has been collected.
+        """
+        data_frame = self._data_frame()
+        if data_frame is None:
+            raise ReferenceError("The indexed data frame no longer exists.")
+        return data_frame
+
+    def permutation(self, column: str) -> np.ndarray:
+        """Get the permutation that sorts a column in ascending order.
+
+        Missing values are sorted to the end. Discrete columns are sorted
+        by their string values.
+
+        :param column: A column of the data frame.
+        :return: An array of every row position.
+        """
+        with self._lock:
+            if column not in self._orders:
+                series = self.data_frame[column]
+                if io.output.is_discrete(series):
+                    values = io.output.discrete_values(series)
+                    is_missing = values.isna().to_numpy()
+                    values = values.astype(str).to_numpy()
+                else:
+                    values = series.to_numpy(dtype=np.float64)
+                    is_missing = np.isnan(values)
+
+                order = np.argsort(values, kind="stable")
+                # Missing values are moved to the end.
+                order = np.concatenate((order[~is_missing[order]],
+                                        order[is_missing[order]]))
+                self._orders[column] = order
+                self._present[column] = np.count_nonzero(~is_missing)
+                logger.debug(f"Sorted column index built: {column}")
+            return self._orders[column]
+
+    def sorted_column(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the permutation that sorts a continuous column, and its
+        sorted values.
+
+        Missing values are left out of both arrays.
+
+        :param column: A continuous column of the data frame.
+        :return: A ``(order, sorted_values)`` tuple.
+        """
+        order = self.permutation(column)[:self._present[column]]
+        with self._lock:
+            if column not in self._values:
+                self._values[column] = self.data_frame[column].to_numpy(
+                    dtype=np.float64)[order]
+            return order, self._values[column]
+
+    def sorted_rows(self, column: str, ascending: bool = True
+                    ) -> np.ndarray:
+        """Get every row position, sorted by a column.
+
+        Missing values are placed last in either direction.
+
+        :param column: A column of the data frame.
+        :param ascending: The direction of the sort.
+        :return: An array of every row position.
+        """
+        order = self.permutation(column)
+        if ascending:
+            return order
+        present = self._present[column]
+        return np.concatenate((order[present - 1::-1] if present else
+                               order[:0], order[present:]))
+
+    def range_positions(self, column: str, start: float,
+                        end: float) -> np.ndarray:
+        """Find the rows of a column with values in [start, end].
+
+        :param column: A continuous column of the data frame.
+        :param start: The lowest value to select, or None.
+        :param end: The highest value to select, or None.
+        :return: The unordered row positions.
+        """
+        order, values = self.sorted_column(column)
+        first = 0 if start is None \
+            else np.searchsorted(values, start, side="left")
+        last = len(values) if end is None \
+            else np.searchsorted(values, end, side="right")
+        return order[first:last]
+
+    def select(self, ranges: Dict[str, Tuple[float, float]]) -> np.ndarray:
+        """Find the rows within every one of a set of column ranges.
+
+        :param ranges: A dictionary of ``{column: (start, end)}``.
+        :return: The sorted row positions.
+        """
+        if not ranges:
+            return np.arange(len(self.data_frame))
+
+        position_sets = []
+        for column, (start, end) in ranges.items():
+            # Box selections may be drawn in either direction.
+            if start is not None and end is not None and start > end:
+                start, end = end, start
+            position_sets.append(self.range_positions(column, start, end))
+
+        # The smallest set is intersected with the others.
+        position_sets.sort(key=len)
+        selected = np.sort(position_sets[0])
+        for positions in position_sets[1:]:
+            selected = selected[np.isin(selected, positions,
+                                        assume_unique=True)]
+        return selected
+
+    def select_polygon(self, x_column: str, y_column: str,
+                       xs: List[float], ys: List[float]) -> np.ndarray:
+        """Find the rows within a polygon, such as a lasso selection.
+
+        Only the rows within the bounding box of the polygon are tested,
+        with the even-odd rule.
+
+        :param x_column: The continuous column of the polygon x values.
+        :param y_column: The continuous column of the polygon y values.
+        :param xs: The x values of the polygon vertices.
+        :param ys: The y values of the polygon vertices.
+        :return: The sorted row positions.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        candidates = self.select({x_column: (xs.min(), xs.max()),
+                                  y_column: (ys.min(), ys.max())})
+        x = self.data_frame[x_column].to_numpy(dtype=np.float64)[candidates]
+        y = self.data_frame[y_column].to_numpy(dtype=np.float64)[candidates]
+
+        inside = np.zeros(len(candidates), dtype=bool)
+        # Each edge from vertex j to vertex i is crossed by a ray from
+        # the point towards positive x.
+        for i, j in zip(range(len(xs)), np.roll(np.arange(len(xs)), 1)):
+            crosses = (ys[i] > y) != (ys[j] > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                edge_x = xs[i] + (y - ys[i]) * (xs[j] - xs[i]) \
+                    / (ys[j] - ys[i])
+            inside ^= crosses & (x < edge_x)
+        return candidates[inside]
+
+
+def sorted_columns(data_frame: pd.DataFrame,
+                   columns: List[str] = None) -> SortedColumns:
+    """Get the ``SortedColumns`` of a data frame, which are kept with it.
+
+    :param data_frame: The data frame of a session.
+    :param columns: Continuous columns to be sorted now, rather than when
+        first queried.
+    :return:
+    """
+    store = io.profiles.frame_store(data_frame)
+    index = store.get("sorted_columns")
+    if index is None:
+        index = store.setdefault("sorted_columns", SortedColumns(data_frame))
+
+    for column in columns or []:
+        index.sorted_column(column)
+    return index
+
+
+def page_rows(data_frame: pd.DataFrame,
+              page: int,
+              page_size: int,
+              sort_column: str = None,
+              ascending: bool = True,
+              mask: np.ndarray = None) -> Tuple[np.ndarray, int]:
+    """Find the rows of a page of a sorted and filtered data frame.
+
+    :param data_frame: The data frame of the session.
+    :param page: The zero-based page number.
+    :param page_size: The number of rows per page.
+    :param sort_column: An optional column to sort the rows by.
+    :param ascending: The direction of the sort.
+    :param mask: An optional boolean array of the rows to keep.
+    :return: A tuple of the row positions of the page and the number of
+        rows over every page.
+    """
+    if sort_column is None:
+        rows = np.arange(len(data_frame))
+    else:
+        rows = sorted_columns(data_frame).sorted_rows(sort_column, ascending)
+
+    if mask is not None:
+        rows = rows[mask[rows]]
+
+    return rows[page * page_size:(page + 1) * page_size], len(rows)
+
+
+# ----------------------------------------------------------------------------
+# Selection Statistics
+# ----------------------------------------------------------------------------
+
+
+class SelectionSummary(NamedTuple):
+    count: int
+    """The number of selected rows."""
+    numeric: pd.DataFrame
+    """The count, mean, std, min and max of each numeric column."""
+    discrete: Dict[str, pd.Series]
+    """The number of selected rows with each value of a discrete column."""
+    experiments: pd.Series
+    """The number of selected rows of each experiment uuid."""
+
+
+def selection_statistics(main_df: pd.DataFrame,
+                         metadata_df: io.MetadataTable,
+                         selected_indexes: List[int],
+                         columns: List[str] = None
+                         ) -> SelectionSummary:
+    """Summarize a selection of rows.
+
+    Each column is read as an array without copying the data frame, and
+    only the selected values are gathered from it.
+
+    :param main_df: The data frame of the session.
+    :param metadata_df: The ``MetadataTable`` of the session.
+    :param selected_indexes: The selected row positions.
+    :param columns: The columns to summarize. Defaults to every column.
+    :return: A ``SelectionSummary``.
+    """
+    if columns is None:
+        columns = list(main_df.columns)
+    positions = np.asarray(selected_indexes, dtype=np.int64)
+
+    numeric = {}
+    discrete = {}
+    for column in columns:
+        values = main_df[column].to_numpy()[positions]
+
+        if values.dtype == object:
+            discrete[column] = io.output.discrete_values(
+                pd.Series(values)).value_counts()
+            continue
+
+        values = values.astype(np.float64, copy=False)
+        values = values[~np.isnan(values)]
+        count = len(values)
+        numeric[column] = dict(
+            count=count,
+            mean=values.mean() if count else np.nan,
+            std=values.std(ddof=1) if count > 1 else np.nan,
+            min=values.min() if count else np.nan,
+            max=values.max() if count else np.nan)
+
+    # Rows are counted by their experiment, any column of a row with
+    # metadata gives the same experiment.
+    codes = metadata_df.codes.to_numpy()[positions].max(axis=1) \
+        if len(metadata_df.columns) else np.full(len(positions), -1)
+    code_counts = np.bincount(codes[codes >= 0],
+                              minlength=len(metadata_df.keys))
+    experiments = pd.Series(code_counts, index=metadata_df.keys["experiment"])
+    experiments = experiments[experiments > 0].groupby(level=0).sum()
+
+    return SelectionSummary(
+        count=len(positions),
+        numeric=pd.DataFrame.from_dict(
+            numeric, orient="index",
+            columns=["count", "mean", "std", "min", "max"]),
+        discrete=discrete,
+        experiments=experiments)
+
+
+def selection_summary_html(summary: SelectionSummary,
+                           metadata: dict) -> str:
+    """Render a ``SelectionSummary`` as HTML tables.
+
+    :param summary:
+    :param metadata: The metadata dictionary, used to name experiments.
     :return:
     """
+    if not summary.count:
+        return ""
+
+    parts = [f"<h4>{summary.count} points selected</h4>"]
+    if len(summary.numeric):
+        parts.append(summary.numeric.to_html(float_format="{:.4g}".format,
+                                             na_rep="-"))
+
+    for column, counts in summary.discrete.items():
+        parts.append(counts.rename_axis(column).to_frame("count").to_html())
+
+    if len(summary.experiments):
+        names = [getattr(metadata.get(key), "name", key)
+                 for key in summary.experiments.index]
+        parts.append(pd.DataFrame({"count": summary.experiments.to_numpy()},
+                                  index=pd.Index(names, name="Experiment")
+                                  ).to_html())
 
-    return metadata_df.iloc[index_selections, :].values
+    return "".join(parts)
 
 
 # ----------------------------------------------------------------------------
@@ -248,15 +706,18 @@ def get_metadata_keys(metadata_df: pd.DataFrame,
 
 def build_selection_controls(bokeh_source: bk.models.ColumnDataSource,
                              x_groups: GroupTypes,
-                             y_groups: GroupTypes
+                             y_groups: GroupTypes,
+                             profile: Dict[str, io.ColumnProfile] = None
                              ) -> Dict[str, bk.models.Select]:
     """Build a dictionary of bokeh selection controls based on given
     groups and data.
 
     :param bokeh_source: The data set to be examined in the form of
-        a bokeh ColumnDataSource model.
+        a bokeh ColumnDataSource model. Not used if ``profile`` is given.
     :param x_groups: A user-given grouping query for axis values.
     :param y_groups: A user-given grouping query for axis values.
+    :param profile: The column profiles of the data, see
+        ``io.column_profile``. If given the source data is not read.
     :return: A dictionary of labels values and controllers.
 
     """
@@ -265,8 +726,13 @@ def build_selection_controls(bokeh_source: bk.models.ColumnDataSource,
 
     # Create a dictionary of column groups. They keys are:
     # columns, discrete, continuous, quantileable.
-    column_groups = categorize_columns(bokeh_source.to_df(),
-                                       x_groups, y_groups)
+    if profile is None:
+        data_frame = bokeh_source.to_df()
+    else:
+        # Only the column names are needed alongside the profiles.
+        data_frame = pd.DataFrame(columns=list(profile))
+    column_groups = categorize_columns(data_frame, x_groups, y_groups,
+                                       profile)
     # Get the names of those columns in the Y groups.
     y_names = get_group_keys(y_groups)
 
@@ -305,22 +771,99 @@ def build_selection_controls(bokeh_source: bk.models.ColumnDataSource,
     return selection_controls
 
 
+def build_filter_controls(x_groups: GroupTypes,
+                          y_groups: GroupTypes,
+                          profile: Dict[str, io.ColumnProfile]
+                          ) -> Dict[str, bk.models.Widget]:
+    """Build a filter widget for each categorized column.
+
+    Continuous columns are given a range slider over their extent, and
+    discrete columns a multi-select of their categories. Nothing is
+    filtered while a slider spans its whole range, or no category is
+    selected.
+
+    :param x_groups: A user-given grouping query for axis values.
+    :param y_groups: A user-given grouping query for axis values.
+    :param profile: The column profiles of the data, see
+        ``io.column_profile``.
+    :return: A dictionary of ``{column_name: widget}``.
+
+    """
+    column_groups = categorize_columns(pd.DataFrame(columns=list(profile)),
+                                       x_groups, y_groups, profile)
+    filter_controls = dict()
+
+    for column in column_groups["continuous"]:
+        start, end = profile[column].minimum, profile[column].maximum
+        # A column of a single value (or none) cannot be filtered.
+        if start is None or start == end:
+            continue
+        filter_controls[column] = bk.models.RangeSlider(
+            title=column, start=start, end=end, value=(start, end),
+            step=(end - start) / 100)
+
+    for column in column_groups["discrete"]:
+        filter_controls[column] = bk.models.MultiSelect(
+            title=column, value=[],
+            options=[str(category)
+                     for category in profile[column].categories])
+
+    logger.info(f"Constructed filter controls: {filter_controls.keys()}")
+    return filter_controls
+
+
+def filter_mask(data_frame: pd.DataFrame,
+                column: str,
+                widget: bk.models.Widget) -> Union[np.ndarray, None]:
+    """Compute the rows of a data frame passed by a filter widget.
+
+    :param data_frame: The data frame of the session.
+    :param column: The column filtered by the widget.
+    :param widget: A widget from ``build_filter_controls``.
+    :return: A boolean array, or None if the widget filters nothing.
+
+    """
+    if isinstance(widget, bk.models.MultiSelect):
+        if not widget.value:
+            return None
+        values = io.output.discrete_values(data_frame[column]).astype(str)
+        return values.isin(widget.value).to_numpy()
+
+    start, end = widget.value
+    if start <= widget.start and end >= widget.end:
+        return None
+
+    # The rows within the range are found from the sorted column.
+    mask = np.zeros(len(data_frame), dtype=bool)
+    mask[sorted_columns(data_frame).range_positions(column, start, end)] = True
+    return mask
+
+
 def create_colors(bokeh_source: bk.models.ColumnDataSource,
                   color_column: str,
-                  palette=PALETTE
+                  palette=PALETTE,
+                  profile: Dict[str, io.ColumnProfile] = None
                   ) -> Union[str, Dict[str, bk.models.ColorMapper]]:
     """Create a color map based on a given column.
 
     :param bokeh_source:
     :param color_column:
     :param palette:
+    :param profile: The column profiles of the data, see
+        ``io.column_profile``. If given the source data is not read.
     :return:
     """
     if color_column != "None":
-        unique_factors = np.unique(bokeh_source.data[color_column])
+        if profile is not None:
+            unique_factors = list(profile[color_column].categories)
+        else:
+            unique_factors = np.unique(bokeh_source.data[color_column])
+        # Palettes are given for a range of sizes, a streamed first batch
+        # may have fewer factors than the smallest.
+        size = min(max(len(unique_factors), min(palette)), max(palette))
         color_mapper = bk.models.CategoricalColorMapper(
             factors=unique_factors,
-            palette=palette[len(unique_factors)])
+            palette=palette[size])
 
         logger.debug(f"Color map generated for {color_column}")
         return {"field": color_column, "transform": color_mapper}
@@ -332,19 +875,25 @@ def create_colors(bokeh_source: bk.models.ColumnDataSource,
 
 
 def create_sizes(bokeh_source: bk.models.ColumnDataSource,
-                 size_column: str
+                 size_column: str,
+                 profile: Dict[str, io.ColumnProfile] = None
                  ) -> Union[Dict[str, bk.models.LinearInterpolator], int]:
     """
 
     :param bokeh_source:
     :param size_column:
+    :param profile: The column profiles of the data, see
+        ``io.column_profile``. If given the source data is not read.
     :return:
     """
     if size_column != "None":
-        size_scale = bk.models.LinearInterpolator(
-            x=[min(bokeh_source.data[size_column]),
-               max(bokeh_source.data[size_column])],
-            y=[3, 15])
+        if profile is not None:
+            size_range = [profile[size_column].minimum,
+                          profile[size_column].maximum]
+        else:
+            size_range = [min(bokeh_source.data[size_column]),
+                          max(bokeh_source.data[size_column])]
+        size_scale = bk.models.LinearInterpolator(x=size_range, y=[3, 15])
         logger.debug(f"Size map generated for {size_column}")
         return dict(field=size_column, transform=size_scale)
     else:
@@ -352,6 +901,108 @@ def create_sizes(bokeh_source: bk.models.ColumnDataSource,
         return 7
 
 
+def render_metadata_html(key: str, item) -> str:
+    """Render a metadata model as HTML.
+
+    Results are cached by the model uuid, which is derived from the model
+    content (see ``models.util.create_uuid``).
+
+    :param key: The uuid of the model.
+    :param item: The model, an entry of the metadata dictionary.
+    :return: The HTML of the model.
+    """
+    with _METADATA_HTML_LOCK:
+        try:
+            METADATA_HTML_CACHE.move_to_end(key)
+            return METADATA_HTML_CACHE[key]
+        except KeyError:
+            pass
+
+    try:
+        html = markdown.markdown(item.as_markdown)
+    except Exception as error:
+        html = str(item)
+        logger.error(error)
+
+    with _METADATA_HTML_LOCK:
+        METADATA_HTML_CACHE[key] = html
+        if len(METADATA_HTML_CACHE) > METADATA_HTML_CACHE_SIZE:
+            METADATA_HTML_CACHE.popitem(last=False)
+    return html
+
+
+class MetadataHTMLStore:
+    """The metadata HTML of a session, rendered in the background.
+
+    Each model of the metadata dictionary is submitted to a thread pool
+    when the store is created. Models added to the dictionary later (such
+    as those of streamed batches) are rendered when first requested.
+
+    """
+
+    def __init__(self, metadata_dict: dict,
+                 executor: concurrent.futures.Executor = RENDER_EXECUTOR):
+        self._futures = {
+            key: executor.submit(render_metadata_html, key, item)
+            for key, item in metadata_dict.items()}
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+    def html(self, key: str, item) -> str:
+        """Get the HTML of a model, waiting for it if it is still being
+        rendered.
+
+        :param key: The uuid of the model.
+        :param item: The model, an entry of the metadata dictionary.
+        :return: The HTML of the model.
+        """
+        future = self._futures.get(key)
+        if future is None:
+            return render_metadata_html(key, item)
+        return future.result()
+
+
+def prerender_metadata(metadata_dict: dict,
+                       current_document: bk.document.Document = None
+                       ) -> MetadataHTMLStore:
+    """Start rendering the HTML of every metadata model of a session.
+
+    The store is kept for the document, and read by
+    ``build_metadata_html`` for the rest of the session.
+
+    :param metadata_dict: The metadata dictionary of the session.
+    :param current_document: The bokeh Document of the session. Defaults
+        to `bk.io.curdoc()`.
+    :return: The ``MetadataHTMLStore`` of the session.
+    """
+    if current_document is None:
+        current_document = bk.io.curdoc()
+
+    store = MetadataHTMLStore(metadata_dict)
+    METADATA_STORES[current_document] = store
+    logger.info(f"Rendering {len(store)} metadata models in the background.")
+    return store
+
+
+def build_metadata_html(metadata_dict: dict,
+                        keys: Tuple[str, ...]
+                        ) -> str:
+    """Render the metadata of a row of key tuples as HTML.
+
+    :param metadata_dict:
+    :param keys: A row of metadata key tuples, see ``get_metadata_keys``.
+    :return:
+    """
+    # Use the pre-rendered HTML of the session, if there is any.
+    store = METADATA_STORES.get(bk.io.curdoc())
+    render = render_metadata_html if store is None else store.html
+
+    unique_keys = dict.fromkeys(itertools.chain.from_iterable(keys))
+    return "".join(render(key, metadata_dict[key])
+                   for key in unique_keys if key in metadata_dict)
+
+
 def build_metadata_paragraph(metadata_dict: dict,
                              keys: Tuple[str, ...]
                              ) -> bk.models.widgets.Paragraph:
@@ -361,52 +1012,62 @@ def build_metadata_paragraph(metadata_dict: dict,
     :param keys:
     :return:
     """
-    unique_keys = set(itertools.chain.from_iterable(keys))
-    metadata_items = [metadata_dict.get(key) for key in unique_keys]
-
-    text = ""
-    for item in metadata_items:
-        try:
-            text += markdown.markdown(item.as_markdown)
-        except Exception as error:
-            text += str(item)
-            logger.error(error)
-
-    paragraph = bk.models.widgets.Div(text=text)
+    paragraph = bk.models.widgets.Div(
+        text=build_metadata_html(metadata_dict, keys))
     return paragraph
 
 
-def create_metadata_column(metadata_df: pd.DataFrame,
-                           metadata: dict,
-                           selected_indexes: List[int] = None
-                           ) -> bk.layouts.column:
-    """
+def metadata_selection_html(metadata_df: io.MetadataTable,
+                            metadata: dict,
+                            selected_indexes: List[int] = None
+                            ) -> str:
+    """Render the metadata of a selection of rows as HTML.
+
+    Rows that share the same metadata are rendered once.
 
     :param metadata_df:
     :param metadata:
     :param selected_indexes:
     :return:
     """
-
     logger.debug(f"Points selected: {selected_indexes}")
 
     # We must handle the None case so that we can call this function
     # upon application start, as well as point deselection.
-    if selected_indexes:
-        # Get the foreign keys from the bokeh source.
-        selected_metadata_keys = get_metadata_keys(metadata_df,
-                                                   selected_indexes)
+    if not selected_indexes:
+        return "<p>No data point selected.</p>"
+
+    # Collapse the selection to its distinct rows of metadata keys.
+    distinct_metadata_keys = metadata_df.resolve_distinct(selected_indexes)
+    logger.debug(f"{len(selected_indexes)} points selected with "
+                 f"{len(distinct_metadata_keys)} distinct metadata rows.")
+
+    return "<hr>".join(build_metadata_html(metadata, keys)
+                       for keys in distinct_metadata_keys)
+
+
+def create_metadata_column(metadata_df: io.MetadataTable,
+                           metadata: dict,
+                           selected_indexes: List[int] = None,
+                           metadata_div: bk.models.widgets.Div = None
+                           ) -> bk.layouts.column:
+    """
 
-        # Use those active keys to build metadata paragraphs.
-        paragraphs = [build_metadata_paragraph(metadata, keys)
-                      for keys in selected_metadata_keys]
+    :param metadata_df:
+    :param metadata:
+    :param selected_indexes:
+    :param metadata_div: An existing Div to be updated with the metadata
+        of the selection. A new Div is created if this is not given.
+    :return:
+    """
+    text = metadata_selection_html(metadata_df, metadata, selected_indexes)
 
+    if metadata_div is None:
+        metadata_div = bk.models.widgets.Div(text=text)
     else:
-        paragraphs = [bk.models.widgets.Paragraph(
-            text="No data point selected.")]
+        metadata_div.text = text
 
-    # Build a column of the generated metadata paragraphs.
-    # They should resolve from most general to most specific.
-    metadata_column = bk.layouts.column(children=paragraphs)
+    # Build a column of the metadata paragraph.
+    metadata_column = bk.layouts.column(children=[metadata_div])
 
     return metadata_column
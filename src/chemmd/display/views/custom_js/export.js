@@ -0,0 +1,11 @@
+// Open the server-side export of the session data. The file is streamed
+// by the bokeh server, see `chemmd.display.export`.
+//
+// Arguments: `base_url` the registered export URL, `export_format` the
+// format Select, and `metadata` the metadata CheckboxGroup.
+
+var url = base_url + "." + export_format.value;
+if (metadata.active.length > 0) {
+    url = url + "?metadata=1";
+}
+window.open(url, "_blank");
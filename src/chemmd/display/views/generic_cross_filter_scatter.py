@@ -6,20 +6,25 @@
 # Standard and data science imports
 # ----------------------------------------------------------------------------
 import logging
+from typing import Iterator, List
 
 # ----------------------------------------------------------------------------
 # Bokeh imports
 # ----------------------------------------------------------------------------
 import bokeh as bk
+import bokeh.events
 import bokeh.layouts
 import bokeh.models
 import bokeh.plotting
+import numpy as np
 import pandas as pd
 
 # ----------------------------------------------------------------------------
 # ISADream imports
 # ----------------------------------------------------------------------------
+from .. import decimation
 from .. import helpers
+from ... import io
 from ...models import GroupTypes
 
 # ----------------------------------------------------------------------------
@@ -35,8 +40,13 @@ TITLE = "Scatter Plot"
 def scatter_layout(x_groups: GroupTypes,
                    y_groups: GroupTypes,
                    main_df: pd.DataFrame,
-                   metadata_df: pd.DataFrame,
-                   metadata: dict) -> bk.models.Panel:
+                   metadata_df: io.MetadataTable,
+                   metadata: dict,
+                   batches: Iterator = None,
+                   aggregation: io.Aggregation = None,
+                   point_budget: int = None,
+                   source: bk.models.ColumnDataSource = None,
+                   view: bk.models.CDSView = None) -> bk.models.Panel:
     """
 
     :param x_groups:
@@ -44,44 +54,262 @@ def scatter_layout(x_groups: GroupTypes,
     :param main_df:
     :param metadata_df:
     :param metadata:
+    :param batches: The remaining batches of ``io.stream_nodes_for_bokeh``
+        if ``main_df`` is its first batch. These are appended to the plot
+        after it is displayed.
+    :param aggregation: If given, the binned summary of ``main_df`` is
+        plotted with error bars in place of every point. See
+        ``io.aggregate_session_data``.
+    :param point_budget: If given, at most this many points (shared
+        between the colour series) are sent to the browser, chosen from
+        the visible x range with ``decimation.decimate_frame``. A new set
+        is chosen whenever the x range changes.
+    :param source: A ColumnDataSource of ``main_df`` shared with other
+        views, built with ``helpers.column_data``. The displayed columns
+        are added to it as they are selected. Selections are then linked
+        between the views.
+    :param view: An optional CDSView of ``source`` that gives the points
+        to be drawn. The cross-filter is added to its filters.
     :return:
     """
+    if batches is not None and aggregation is not None:
+        raise ValueError("Streamed batches cannot be aggregated.")
+    if batches is not None and point_budget is not None:
+        raise ValueError("Streamed batches cannot be decimated.")
+    if source is not None and (batches is not None
+                               or aggregation is not None
+                               or point_budget is not None):
+        raise ValueError("A shared source must hold every row of main_df, "
+                         "it cannot be streamed, aggregated or decimated.")
+
+    if aggregation is not None:
+        main_df, metadata_df = io.aggregate_session_data(
+            main_df, metadata_df, aggregation,
+            y_columns=helpers.get_group_keys(y_groups))
+
+    # ------------------------------------------------------------------------
+    # Define selector controls.
+    # ------------------------------------------------------------------------
+    # Create dictionary of controls based on the given groups and data.
+    # The column profiles are computed once and kept with the data frame,
+    # so the controls and redraws do not read the data again. Streamed
+    # batches are combined into the profile as they arrive.
+    profile = io.column_profile(main_df)
+    controls = helpers.build_selection_controls(None, x_groups, y_groups,
+                                                profile)
+
+    def displayed_columns() -> List[str]:
+        """The columns bound to the current control values."""
+        columns = [controls["x_axis"].value, controls["y_axis"].value]
+        for name in ("color", "size"):
+            if name in controls and controls[name].value != "None":
+                columns.append(controls[name].value)
+        if aggregation is not None:
+            columns += [f"{controls['y_axis'].value} lower",
+                        f"{controls['y_axis'].value} upper"]
+        return list(dict.fromkeys(columns))
+
     # ------------------------------------------------------------------------
     # Create the interactive bokeh column data source.
     # ------------------------------------------------------------------------
-    source = bk.models.ColumnDataSource(main_df)
+    # Only the displayed columns are sent to the browser, others are added
+    # by ``helpers.project_columns`` when a control selects them. Streamed
+    # rows are not held on the server, so every column is sent. Decimated
+    # sources are filled once the axes have been chosen.
+    # The streamed batches are kept alongside the extended metadata_df, so
+    # that selections of streamed rows can be summarized.
+    streamed_frames = [main_df]
+
+    def current_frame() -> pd.DataFrame:
+        """The rows of main_df and of every batch streamed so far."""
+        # Batches are only combined when they are needed.
+        if len(streamed_frames) > 1:
+            streamed_frames[:] = [pd.concat(streamed_frames)]
+        return streamed_frames[0]
+
+    def add_batch(batch_df: pd.DataFrame):
+        """Keep a streamed batch, and widen the profile to its values."""
+        streamed_frames.append(batch_df)
+        changed = []
+        batch_profile = io.column_profile(
+            batch_df, [column for column in profile if column in batch_df])
+        for column, column_profile in batch_profile.items():
+            combined = io.combine_profiles(profile[column], column_profile)
+            if combined != profile[column]:
+                profile[column] = combined
+                changed.append(column)
+
+        # The colour factors and size range follow the streamed values.
+        if any(name in controls and controls[name].value in changed
+               for name in ("color", "size")):
+            update_figure()
+
+    if source is not None:
+        helpers.project_columns(source, main_df, displayed_columns())
+    elif batches is not None:
+        source = bk.models.ColumnDataSource(main_df)
+        helpers.stream_batches(source, metadata_df, metadata, batches,
+                               on_batch=add_batch)
+    else:
+        source = bk.models.ColumnDataSource(data=helpers.column_data(
+            main_df, displayed_columns(),
+            None if point_budget is None else []))
 
     # ------------------------------------------------------------------------
     # Define point selection callback.
     # ------------------------------------------------------------------------
+    def show_selection(selected_indexes):
+        # Update the text of the metadata panel, rather than replacing it.
+        metadata_div.text = helpers.metadata_selection_html(
+            metadata_df, metadata, selected_indexes)
+
+        # Summarize the whole selection, however large.
+        statistics_div.text = helpers.selection_summary_html(
+            helpers.selection_statistics(current_frame(), metadata_df,
+                                         selected_indexes or []),
+            metadata)
+
     def point_selection_callback(attr, old, new):
         # Get the selected value indices or None with a ternary operator.
         selected_indexes = new['1d']['indices'] \
             if new['1d']['indices'] else None
 
-        # Create the metadata column layout element.
-        column = helpers.create_metadata_column(
-            metadata_df, metadata, selected_indexes)
-        # Get the parent layout element and update its children.
-        curr_layout = bk.plotting.curdoc().get_model_by_name(
-            'metadata_column')
-        curr_layout.children[0] = column
+        # The source may hold a subset of the rows, its index column
+        # gives the row of the full data frame. A box or lasso over
+        # decimated points is then resolved against the full data by the
+        # geometry selection callback, which follows this one.
+        if selected_indexes:
+            selected_indexes = [source.data["index"][index]
+                                for index in selected_indexes]
+
+        show_selection(selected_indexes)
+
+    def geometry_selection_callback(event):
+        geometry = event.geometry
+        if geometry.get("type") not in ("rect", "poly") or not event.final:
+            return
+
+        # Rows within the box or polygon are found from the sorted
+        # columns, rather than by scanning every value.
+        index = helpers.sorted_columns(current_frame())
+        x_column, y_column = controls["x_axis"].value, controls["y_axis"].value
+        if geometry["type"] == "rect":
+            positions = index.select({
+                x_column: (geometry["x0"], geometry["x1"]),
+                y_column: (geometry["y0"], geometry["y1"])})
+        else:
+            positions = index.select_polygon(x_column, y_column,
+                                             geometry["x"], geometry["y"])
+        # Rows hidden by the cross-filter are not part of the selection.
+        mask = combined_mask()
+        if mask is not None:
+            positions = positions[mask[positions]]
+        logger.debug(f"Geometry selected {len(positions)} rows.")
+        show_selection(positions.tolist())
+
+    # A single Div displays the metadata of every selection.
+    metadata_div = bk.models.widgets.Div(
+        text=helpers.metadata_selection_html(metadata_df, metadata))
+    statistics_div = bk.models.widgets.Div(name="selection_statistics")
 
     # Add the point selection callback to the bokeh source object.
     source.on_change("selected", point_selection_callback)
 
     # ------------------------------------------------------------------------
-    # Define selector controls, and add a callback function.
+    # Define the cross-filter controls.
+    #
+    # Each control has its own cached mask over the rows of main_df, the
+    # displayed points are those passed by every mask.
     # ------------------------------------------------------------------------
-    # Create dictionary of controls based on the given groups and data.
-    controls = helpers.build_selection_controls(source, x_groups, y_groups)
+    # Streamed rows are not yet in main_df, so they cannot be filtered.
+    filter_controls = helpers.build_filter_controls(
+        x_groups, y_groups, profile) if batches is None else {}
+    filter_masks = {}
+    boolean_filter = bk.models.BooleanFilter(
+        booleans=[True] * len(source.data["index"]))
+    if view is None:
+        view = bk.models.CDSView(source=source, filters=[boolean_filter])
+        use_view = bool(filter_controls)
+    else:
+        # The cross-filter narrows the rows of the given view.
+        if filter_controls:
+            view.filters = list(view.filters) + [boolean_filter]
+        use_view = True
+
+    def combined_mask():
+        """The rows of main_df passed by every filter, or None if no
+        filter is active."""
+        masks = [mask for mask in filter_masks.values() if mask is not None]
+        return np.logical_and.reduce(masks) if masks else None
+
+    def apply_filters():
+        """Combine the cached masks of every filter into the view."""
+        if not filter_controls:
+            return
+        mask = combined_mask()
+        rows = np.asarray(source.data["index"], dtype=np.int64)
+        if mask is not None:
+            booleans = mask[rows]
+        else:
+            booleans = np.ones(len(rows), dtype=bool)
+        boolean_filter.booleans = booleans.tolist()
+
+    def filter_callback(column):
+        def callback(attr, old, new):
+            logger.debug(f"Filter changed: {column}, {new}")
+            # Only the mask of the changed control is computed again.
+            filter_masks[column] = helpers.filter_mask(
+                main_df, column, filter_controls[column])
+            apply_filters()
+        return callback
+
+    for column, filter_control in filter_controls.items():
+        filter_control.on_change("value", filter_callback(column))
+
+    # ------------------------------------------------------------------------
+    # Define the decimation of the displayed points.
+    # ------------------------------------------------------------------------
+    pending_refinement = []
+
+    def refine_points(x_range=None):
+        """Fill the source with the rows chosen for the current axes."""
+        color = controls["color"].value if "color" in controls else "None"
+        positions = decimation.decimate_frame(
+            main_df, controls["x_axis"].value, controls["y_axis"].value,
+            point_budget, x_range=x_range,
+            by=None if color == "None" else color)
+        # Columns added to the source earlier are kept.
+        columns = [column for column in source.data if column != "index"]
+        source.data = helpers.column_data(
+            main_df, list(dict.fromkeys(columns + displayed_columns())),
+            positions)
+        # The filter booleans follow the rows now in the source.
+        apply_filters()
+
+    def range_callback(attr, old, new):
+        # Range start and end change together when zooming, so the
+        # refinement is done once on the next tick.
+        if pending_refinement:
+            return
+        pending_refinement.append(attr)
+
+        def refine_visible_points():
+            pending_refinement.clear()
+            refine_points((figure.x_range.start, figure.x_range.end))
+
+        bk.plotting.curdoc().add_next_tick_callback(refine_visible_points)
+
+    if point_budget is not None:
+        refine_points()
 
     def controller_callback(attr, old, new):
         logger.debug(f"Scatter callback activated: {attr}, {old}, {new}")
-        # Get the parent layout that contains the main figure.
-        curr_layout = bk.plotting.curdoc().get_model_by_name('main_figure')
-        # Replace the current child with an updated figure.
-        curr_layout.children[0] = build_figure()
+        if point_budget is not None:
+            refine_points()
+        elif batches is None:
+            helpers.project_columns(source, main_df, displayed_columns())
+        # The figure is updated in place, rather than rebuilt.
+        update_figure()
 
     # Assign the callback function defined above to each of the generated
     # selector controls.
@@ -89,13 +317,15 @@ def scatter_layout(x_groups: GroupTypes,
         control.on_change("value", controller_callback)
 
     # Create a bokeh widget box layout to hold the controls.
-    control_widget = bk.layouts.widgetbox(list(controls.values()))
+    control_widget = bk.layouts.widgetbox(list(controls.values())
+                                          + list(filter_controls.values()))
 
     # ------------------------------------------------------------------------
     # Define the primary figure.
     # ------------------------------------------------------------------------
     def build_figure() -> bk.plotting.Figure:
-        """
+        """Build the figure and its renderers once, these are then set to
+        the selected controls by ``update_figure``.
 
         :return:
         """
@@ -105,37 +335,106 @@ def scatter_layout(x_groups: GroupTypes,
                                     plot_width=600,
                                     plot_height=600)
 
-        # Set the axis titles of the figure.
-        figure.xaxis.axis_label = controls["x_axis"].value
-        figure.yaxis.axis_label = controls["y_axis"].value
-
         # Draw circles (corresponding to data) on the figure.
-        circles = figure.circle(
-            source=source,
-            x=controls["x_axis"].value,
-            y=controls["y_axis"].value,
-            color=helpers.create_colors(source, controls["color"].value),
-            size=helpers.create_sizes(source, controls["size"].value))
+        # The view is only used when there are filters (or it was given),
+        # as a streamed source outgrows its booleans.
+        figure.circle(name="scatter_circles",
+                      source=source,
+                      x=controls["x_axis"].value,
+                      y=controls["y_axis"].value,
+                      **(dict(view=view) if use_view else {}))
+
+        # Aggregated data is drawn with one standard deviation error bars.
+        if aggregation is not None:
+            figure.add_layout(bk.models.Whisker(
+                name="scatter_whiskers", source=source,
+                base=controls["x_axis"].value,
+                lower=f"{controls['y_axis'].value} lower",
+                upper=f"{controls['y_axis'].value} upper"))
 
         # An ad-hoc method to create a legend outside of the plot area.
-        # The renderer created above is used to give context to the legend.
+        # The renderer created above is used to give context to the legend,
+        # it is hidden while no colour column is selected.
         # TODO: Fix the resizing bug associated with this.
-        if controls["color"].value != "None":
-            legend_item = bk.models.LegendItem(
-                label=dict(field=controls["color"].value),
-                renderers=[circles])
-            legend = bk.models.Legend(items=[legend_item])
-            figure.add_layout(legend, "below")
-            figure.legend.orientation = "horizontal"
+        legend = bk.models.Legend(name="scatter_legend",
+                                  orientation="horizontal")
+        figure.add_layout(legend, "below")
 
         # Add tools for interactivity to the figure.
         figure.add_tools(bk.models.TapTool())  # Required for selections.
+        figure.add_tools(bk.models.BoxSelectTool())
+
+        # Choose new points from the full data when the view changes, and
+        # select from the full data rather than the displayed points.
+        if point_budget is not None:
+            figure.x_range.on_change("start", range_callback)
+            figure.x_range.on_change("end", range_callback)
+            figure.on_event(bk.events.SelectionGeometry,
+                            geometry_selection_callback)
 
-        logger.info(f"""Bokeh scatter figure created.
-        x: {controls["x_axis"].value}
-        y: {controls["y_axis"].value}""")
         return figure
 
+    def update_figure():
+        """Set the fields, transforms and axes of the figure to the
+        selected controls."""
+        x_column = controls["x_axis"].value
+        y_column = controls["y_axis"].value
+        color_column = controls["color"].value \
+            if "color" in controls else "None"
+        size_column = controls["size"].value \
+            if "size" in controls else "None"
+
+        circles = figure.select_one({"name": "scatter_circles"})
+        circles.glyph.x = x_column
+        circles.glyph.y = y_column
+        color = helpers.create_colors(source, color_column,
+                                      profile=profile)
+        circles.glyph.fill_color = color
+        circles.glyph.line_color = color
+        circles.glyph.size = helpers.create_sizes(source, size_column,
+                                                   profile=profile)
+
+        whiskers = figure.select_one({"name": "scatter_whiskers"})
+        if whiskers is not None:
+            whiskers.base = x_column
+            whiskers.lower = f"{y_column} lower"
+            whiskers.upper = f"{y_column} upper"
+
+        legend = figure.select_one({"name": "scatter_legend"})
+        if color_column != "None":
+            legend.items = [bk.models.LegendItem(
+                label=dict(field=color_column), renderers=[circles])]
+            legend.visible = True
+        else:
+            legend.items = []
+            legend.visible = False
+
+        # The x axis and its scale are only replaced if the scale changes.
+        x_axis_type = controls["x_axis_type"].value
+        x_axis = figure.xaxis[0]
+        if isinstance(x_axis, bk.models.LogAxis) != (x_axis_type == "log"):
+            if x_axis_type == "log":
+                figure.x_scale = bk.models.LogScale()
+                new_axis = bk.models.LogAxis()
+            else:
+                figure.x_scale = bk.models.LinearScale()
+                new_axis = bk.models.LinearAxis()
+            figure.below = [new_axis if model is x_axis else model
+                            for model in figure.below]
+            figure.xgrid[0].ticker = new_axis.ticker
+            x_axis = new_axis
+
+        # Set the axis titles of the figure.
+        x_axis.axis_label = x_column
+        figure.yaxis[0].axis_label = y_column
+
+        logger.info(f"""Bokeh scatter figure updated.
+        x: {x_column}
+        y: {y_column}""")
+
+    figure = build_figure()
+    update_figure()
+
     # ------------------------------------------------------------------------
     # Initialize defaults and define the layout.
     #
@@ -149,9 +448,8 @@ def scatter_layout(x_groups: GroupTypes,
             bk.layouts.column(name="control_widget",
                               children=[control_widget]),
             bk.layouts.column(name="main_figure",
-                              children=[build_figure()]),
+                              children=[figure]),
             bk.layouts.column(name="metadata_column",
-                              children=[helpers.create_metadata_column(
-                                  source, metadata)])
+                              children=[statistics_div, metadata_div])
         ]])
     return layout
@@ -0,0 +1,206 @@
+"""Provides a rasterized density plot for very large data sets.
+
+Points are counted into a grid of bins on the server, and only the grid
+is sent to the browser as an image. The grid is re-binned over the visible
+range when the plot is panned or zoomed.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Standard and data science imports
+# ----------------------------------------------------------------------------
+import logging
+
+# ----------------------------------------------------------------------------
+# Bokeh imports
+# ----------------------------------------------------------------------------
+import bokeh as bk
+import bokeh.layouts
+import bokeh.models
+import bokeh.palettes
+import bokeh.plotting
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------------
+# ISADream imports
+# ----------------------------------------------------------------------------
+from .. import density
+from .. import helpers
+from ... import io
+from ...models import GroupTypes
+
+# ----------------------------------------------------------------------------
+# Global definitions.
+# ----------------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+TITLE = "Density Plot"
+PALETTE = bk.palettes.Viridis256  # pylint: disable=maybe-no-member
+
+
+# ----------------------------------------------------------------------------
+# Bokeh Layout Definition
+# ----------------------------------------------------------------------------
+def density_layout(x_groups: GroupTypes,
+                   y_groups: GroupTypes,
+                   main_df: pd.DataFrame,
+                   metadata_df: io.MetadataTable,
+                   metadata: dict,
+                   bins: int = 200) -> bk.models.Panel:
+    """
+
+    :param x_groups:
+    :param y_groups:
+    :param main_df:
+    :param metadata_df:
+    :param metadata:
+    :param bins: The number of bins along each axis of the image.
+    :return:
+    """
+
+    # ------------------------------------------------------------------------
+    # Define selector controls, and add a callback function.
+    # ------------------------------------------------------------------------
+    # The controls only need the column profiles, not the data.
+    controls = helpers.build_selection_controls(
+        None, x_groups, y_groups, io.column_profile(main_df))
+    # Log axes and point sizes do not apply to a binned image.
+    controls = {name: control for name, control in controls.items()
+                if name in ("x_axis", "y_axis", "color")}
+
+    # The image source holds a single image, replaced on each re-binning.
+    image_source = bk.models.ColumnDataSource(
+        data=dict(image=[], x=[], y=[], dw=[], dh=[]))
+
+    def color_column():
+        color = controls["color"].value if "color" in controls else "None"
+        return None if color == "None" else color
+
+    def category_colors(categories):
+        # Category10 only holds up to ten colours, from three upwards.
+        if len(categories) <= max(helpers.PALETTE):
+            return helpers.PALETTE[max(len(categories), 3)][:len(categories)]
+        return bk.palettes.viridis(len(categories))
+
+    def rebin(x_range=None, y_range=None) -> density.DensityGrid:
+        """Fill the image source with the grid of the current axes."""
+        grid = density.bin_density(
+            main_df, controls["x_axis"].value, controls["y_axis"].value,
+            bins=bins, x_range=x_range, y_range=y_range, by=color_column())
+
+        if color_column() is None:
+            # Empty bins are not drawn, rather than given the lowest colour.
+            image = np.where(grid.total > 0, grid.total, np.nan)
+        else:
+            image = density.shade_categories(
+                grid, category_colors(grid.categories))
+
+        (x_start, x_end), (y_start, y_end) = grid.x_range, grid.y_range
+        image_source.data = dict(image=[image], x=[x_start], y=[y_start],
+                                 dw=[x_end - x_start], dh=[y_end - y_start])
+        return grid
+
+    pending_rebin = []
+
+    def range_callback(attr, old, new):
+        # The four range bounds change together when panning or zooming,
+        # so the grid is re-binned once on the next tick.
+        if pending_rebin:
+            return
+        pending_rebin.append(attr)
+
+        def rebin_visible_range():
+            pending_rebin.clear()
+            figure = bk.plotting.curdoc().get_model_by_name(
+                "density_panel_figure")
+            rebin((figure.x_range.start, figure.x_range.end),
+                  (figure.y_range.start, figure.y_range.end))
+
+        bk.plotting.curdoc().add_next_tick_callback(rebin_visible_range)
+
+    def controller_callback(attr, old, new):
+        logger.debug(f"Density callback activated: {attr}, {old}, {new}")
+        # Get the parent layout that contains the main figure.
+        curr_layout = bk.plotting.curdoc().get_model_by_name(
+            'density_figure')
+        # Replace the current child with an updated figure.
+        curr_layout.children[0] = build_figure()
+
+    # Assign the callback function defined above to each of the generated
+    # selector controls.
+    for control in controls.values():
+        control.on_change("value", controller_callback)
+
+    # Create a bokeh widget box layout to hold the controls.
+    control_widget = bk.layouts.widgetbox(list(controls.values()))
+
+    # ------------------------------------------------------------------------
+    # Define the primary figure.
+    # ------------------------------------------------------------------------
+    def build_figure() -> bk.plotting.Figure:
+        """
+
+        :return:
+        """
+        # Bin the full extent of the newly selected columns.
+        grid = rebin()
+
+        # Fixed ranges are used, so that replacing the image does not
+        # reset the range the user has zoomed to.
+        figure = bk.plotting.Figure(
+            name="density_panel_figure",
+            x_range=bk.models.Range1d(*grid.x_range),
+            y_range=bk.models.Range1d(*grid.y_range),
+            plot_width=600,
+            plot_height=600)
+
+        # Set the axis titles of the figure.
+        figure.xaxis.axis_label = controls["x_axis"].value
+        figure.yaxis.axis_label = controls["y_axis"].value
+
+        if color_column() is None:
+            color_mapper = bk.models.LogColorMapper(
+                palette=PALETTE, nan_color=(0, 0, 0, 0))
+            figure.image(image="image", x="x", y="y", dw="dw", dh="dh",
+                         source=image_source, color_mapper=color_mapper)
+            figure.add_layout(bk.models.ColorBar(
+                color_mapper=color_mapper, title="Count"), "right")
+
+        else:
+            figure.image_rgba(image="image", x="x", y="y",
+                              dw="dw", dh="dh", source=image_source)
+            # Each category is given a legend entry of its colour.
+            colors = category_colors(grid.categories)
+            legend = bk.models.Legend(items=[
+                bk.models.LegendItem(label=str(category), renderers=[
+                    figure.square(x=[], y=[], color=color)])
+                for category, color in zip(grid.categories, colors)])
+            figure.add_layout(legend, "below")
+            figure.legend.orientation = "horizontal"
+
+        # Re-bin the visible range when the view changes.
+        for figure_range in (figure.x_range, figure.y_range):
+            figure_range.on_change("start", range_callback)
+            figure_range.on_change("end", range_callback)
+
+        logger.info(f"""Bokeh density figure created.
+        x: {controls["x_axis"].value}
+        y: {controls["y_axis"].value}""")
+        return figure
+
+    # ------------------------------------------------------------------------
+    # Initialize defaults and define the layout.
+    #
+    # The layout elements can be retrieved and updated by their assigned
+    # names.
+    # ------------------------------------------------------------------------
+    layout = bk.layouts.layout(
+        name="density_layout",
+        # Top level lists are columns, nested lists are rows.
+        children=[[
+            bk.layouts.column(name="density_control_widget",
+                              children=[control_widget]),
+            bk.layouts.column(name="density_figure",
+                              children=[build_figure()]),
+        ]])
+    return layout
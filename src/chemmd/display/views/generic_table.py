@@ -9,6 +9,7 @@ once with the same data set requested by the user.
 # Generic Imports
 # ----------------------------------------------------------------------------
 import pkg_resources
+from typing import Iterator, List
 
 # ----------------------------------------------------------------------------
 # Bokeh imports
@@ -20,12 +21,15 @@ import bokeh.models
 # ----------------------------------------------------------------------------
 # Data science imports
 # ----------------------------------------------------------------------------
+import numpy as np
 import pandas as pd
 
 # ----------------------------------------------------------------------------
 # Local project imports
 # ----------------------------------------------------------------------------
+from .. import export
 from .. import helpers
+from ... import io
 from ...models import GroupTypes
 
 # ----------------------------------------------------------------------------
@@ -40,8 +44,12 @@ TITLE = "Data Table"
 def table_layout(x_groups: GroupTypes,
                  y_groups: GroupTypes,
                  main_df: pd.DataFrame,
-                 metadata_df: pd.DataFrame,
-                 metadata: dict) -> bk.models.Panel:
+                 metadata_df: io.MetadataTable,
+                 metadata: dict,
+                 batches: Iterator = None,
+                 page_size: int = None,
+                 source: bk.models.ColumnDataSource = None,
+                 view: bk.models.CDSView = None) -> bk.models.Panel:
     """
 
     :param x_groups:
@@ -49,21 +57,82 @@ def table_layout(x_groups: GroupTypes,
     :param main_df:
     :param metadata_df:
     :param metadata:
+    :param batches: The remaining batches of ``io.stream_nodes_for_bokeh``
+        if ``main_df`` is its first batch. These are appended to the table
+        after it is displayed.
+    :param page_size: If given, only a page of this many rows is sent to
+        the browser. The full data frame is kept on the server, where it
+        is sorted and filtered.
+    :param source: A ColumnDataSource of ``main_df`` shared with other
+        views, built with ``helpers.column_data``. The columns of the
+        table are added to it if it does not hold them. Selections are
+        then linked between the views.
+    :param view: An optional CDSView of ``source`` that gives the rows
+        of the table.
     :returns:
 
     """
-    # Convert the data frame to a Bokeh data format.
-    source = bk.models.ColumnDataSource(main_df)
+    if batches is not None and page_size is not None:
+        raise ValueError("Streamed batches cannot be paged.")
+    if source is not None and (batches is not None or page_size is not None):
+        raise ValueError("A shared source cannot be streamed or paged.")
+
+    if page_size is not None:
+        return paged_table_layout(x_groups, y_groups, main_df, metadata_df,
+                                  metadata, page_size)
 
     # Parse the requested keys to use as column names.
     x_keys = helpers.get_group_keys(x_groups)
     y_keys = helpers.get_group_keys(y_groups)
 
+    # Convert the data frame to a Bokeh data format, unless a source is
+    # shared with other views.
+    if source is None:
+        source = bk.models.ColumnDataSource(main_df)
+    else:
+        helpers.project_columns(source, main_df, x_keys + y_keys)
+
+    if batches is not None:
+        helpers.stream_batches(source, metadata_df, metadata, batches)
+
     # Create the Bokeh table.
     table_columns = [bk.models.TableColumn(field=key, title=key)
                      for key in x_keys + y_keys]
     table = bk.models.DataTable(
-        source=source, columns=table_columns, width=800)
+        source=source, columns=table_columns, width=800,
+        **(dict(view=view) if view is not None else {}))
+
+    # Build the controls widget box. Streamed sessions are not yet held
+    # in full on the server, so they cannot be exported.
+    controls = bk.layouts.widgetbox(
+        [] if batches is not None
+        else build_export_controls(main_df, metadata_df, metadata))
+
+    # Built and return the layout object.
+    layout = bk.layouts.layout(children=[controls, table])
+    return layout
+
+
+def build_export_controls(main_df: pd.DataFrame,
+                          metadata_df: io.MetadataTable,
+                          metadata: dict) -> List[bk.models.Widget]:
+    """Build the controls that download the data of a session.
+
+    The data is registered with ``export.register_export``, and streamed
+    by the server when the download button is clicked.
+
+    :param main_df:
+    :param metadata_df:
+    :param metadata:
+    :returns: A list of the export widgets.
+
+    """
+    export_url = export.register_export(main_df, metadata_df, metadata)
+
+    export_format = bk.models.Select(title="Download Format", value="csv",
+                                     options=list(export.EXPORT_FORMATS))
+    include_metadata = bk.models.CheckboxGroup(labels=["Include metadata"],
+                                               active=[])
 
     # Create the download button.
     button = bk.models.widgets.Button(label="Download",
@@ -71,20 +140,123 @@ def table_layout(x_groups: GroupTypes,
 
     # Load the custom java script.
     js_code_path = pkg_resources.resource_filename(
-        "chemmd", "display/views/custom_js/download.js")
-
-    print(js_code_path)
+        "chemmd", "display/views/custom_js/export.js")
 
     with open(js_code_path, 'r') as file:
         js_code = file.read()
 
     # Apply the custom java script to the button.
-    button.callback = bk.models.CustomJS(args=dict(source=source),
-                                         code=js_code)
+    button.callback = bk.models.CustomJS(
+        args=dict(base_url=export_url, export_format=export_format,
+                  metadata=include_metadata),
+        code=js_code)
+
+    return [export_format, include_metadata, button]
+
+
+def paged_table_layout(x_groups: GroupTypes,
+                       y_groups: GroupTypes,
+                       main_df: pd.DataFrame,
+                       metadata_df: io.MetadataTable,
+                       metadata: dict,
+                       page_size: int) -> bk.models.Panel:
+    """A table that only holds the current page of rows in the browser.
+
+    Sorting and filtering run on the server over the cached sort
+    permutations of ``helpers.sorted_columns``.
+
+    :param x_groups:
+    :param y_groups:
+    :param main_df:
+    :param metadata_df:
+    :param metadata:
+    :param page_size: The number of rows per page.
+    :returns:
+
+    """
+    # Parse the requested keys to use as column names.
+    x_keys = helpers.get_group_keys(x_groups)
+    y_keys = helpers.get_group_keys(y_groups)
+    columns = x_keys + y_keys
+
+    # The source only ever holds a single page.
+    source = bk.models.ColumnDataSource(main_df[columns].iloc[:0])
+
+    # Sorting in the browser would only sort the page, so it is disabled.
+    table_columns = [bk.models.TableColumn(field=key, title=key)
+                     for key in columns]
+    table = bk.models.DataTable(source=source, columns=table_columns,
+                                width=800, sortable=False)
+
+    # ------------------------------------------------------------------------
+    # Define the sort, filter and page controls.
+    # ------------------------------------------------------------------------
+    sort_control = bk.models.Select(title="Sort By", value="None",
+                                    options=["None"] + columns)
+    order_control = bk.models.Select(title="Order", value="ascending",
+                                     options=["ascending", "descending"])
+    filter_controls = helpers.build_filter_controls(
+        x_groups, y_groups, io.column_profile(main_df))
+    previous_button = bk.models.widgets.Button(label="Previous")
+    next_button = bk.models.widgets.Button(label="Next")
+    page_label = bk.models.widgets.Div()
+
+    state = dict(page=0, page_count=1)
+    filter_masks = {}
+
+    def update_page():
+        """Fill the source with the rows of the current page."""
+        masks = [mask for mask in filter_masks.values() if mask is not None]
+        sort_column = None if sort_control.value == "None" \
+            else sort_control.value
+
+        rows, row_count = helpers.page_rows(
+            main_df, state["page"], page_size, sort_column=sort_column,
+            ascending=order_control.value == "ascending",
+            mask=np.logical_and.reduce(masks) if masks else None)
+
+        state["page_count"] = max(-(-row_count // page_size), 1)
+        source.data = bk.models.ColumnDataSource.from_df(
+            main_df[columns].iloc[rows])
+        page_label.text = f"Page {state['page'] + 1} of " \
+                          f"{state['page_count']} ({row_count} rows)"
+
+    def turn_page(step):
+        def callback():
+            page = min(max(state["page"] + step, 0), state["page_count"] - 1)
+            if page != state["page"]:
+                state["page"] = page
+                update_page()
+        return callback
+
+    def sort_callback(attr, old, new):
+        state["page"] = 0
+        update_page()
+
+    def filter_callback(column):
+        def callback(attr, old, new):
+            # Only the mask of the changed control is computed again.
+            filter_masks[column] = helpers.filter_mask(
+                main_df, column, filter_controls[column])
+            state["page"] = 0
+            update_page()
+        return callback
+
+    previous_button.on_click(turn_page(-1))
+    next_button.on_click(turn_page(1))
+    sort_control.on_change("value", sort_callback)
+    order_control.on_change("value", sort_callback)
+    for column, filter_control in filter_controls.items():
+        filter_control.on_change("value", filter_callback(column))
+
+    update_page()
 
     # Build the controls widget box.
-    controls = bk.layouts.widgetbox(button)
+    controls = bk.layouts.widgetbox(
+        [sort_control, order_control, *filter_controls.values(),
+         *build_export_controls(main_df, metadata_df, metadata)])
+    pager = bk.layouts.row(previous_button, page_label, next_button)
 
     # Built and return the layout object.
-    layout = bk.layouts.layout(children=[controls, table])
+    layout = bk.layouts.layout(children=[[controls, [pager, table]]])
     return layout
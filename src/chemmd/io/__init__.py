@@ -21,6 +21,19 @@ from .input import (read_chemmd_json,
                     create_nodes_from_files,
                     node_from_path)
 
-from .output import (prepare_nodes_for_bokeh,
+from .output import (Aggregation,
+                     MetadataTable,
+                     aggregate_session_data,
+                     prepare_nodes_for_bokeh,
+                     stream_nodes_for_bokeh,
                      create_group_mapping,
+                     group_mapping_as_columns,
                      group_mapping_as_df)
+
+from .cache import prepare_files_for_bokeh
+
+from .profiles import ColumnProfile, column_profile, combine_profiles
+
+from .expressions import (evaluate_expression,
+                          expression_group,
+                          derived_groups_from_json)
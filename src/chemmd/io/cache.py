@@ -0,0 +1,236 @@
+"""A shared cache of prepared session data.
+
+Many Bokeh sessions are opened on the same selection of Drupal nodes with
+the same query groups. The results of ``prepare_nodes_for_bokeh`` for such
+sessions are stored here, keyed by the content of the node files, their
+datafiles and the groups (see ``fingerprints``), so that they are only
+computed once per server process.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports -- Standard Python Library
+# ----------------------------------------------------------------------------
+import collections
+import logging
+import threading
+import types
+from typing import List, Tuple, Hashable
+
+# ----------------------------------------------------------------------------
+# Imports -- Data science imports.
+# ----------------------------------------------------------------------------
+import pandas as pd
+
+# ----------------------------------------------------------------------------
+# Local package imports.
+# ----------------------------------------------------------------------------
+from .. import config
+from ..models import GroupTypes, Node
+from .fingerprints import (datafile_fingerprint, file_fingerprint,
+                           groups_fingerprint)
+from .input import create_nodes_from_files
+from .output import MetadataTable, prepare_nodes_for_bokeh
+from .profiles import column_profile, frame_store
+
+logger = logging.getLogger(__name__)
+
+SessionData = Tuple[pd.DataFrame, MetadataTable, types.MappingProxyType]
+
+
+# ----------------------------------------------------------------------------
+# Size Functions
+# ----------------------------------------------------------------------------
+def session_data_size(session_data: SessionData) -> int:
+    """Estimate the memory used by a prepared set of session data.
+
+    The metadata objects are shared with the node models and are small
+    in comparison, so only the frames are counted.
+
+    :param session_data: A ``(main_df, metadata_df, metadata_dict)`` tuple.
+    :returns: The estimated size in bytes.
+
+    """
+    main_df, metadata_df, _ = session_data
+    return int(main_df.memory_usage(deep=True).sum()
+               + metadata_df.codes.memory_usage(deep=True).sum()
+               + metadata_df.keys.memory_usage(deep=True).sum())
+
+
+# ----------------------------------------------------------------------------
+# Cache Definition
+# ----------------------------------------------------------------------------
+class SessionDataCache:
+    """A least recently used cache of session data under a memory budget.
+
+    The cached results are shared between every session that requests
+    them, and must not be modified. Sessions are given a
+    ``session_copy`` of a result.
+
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable):
+        """Get a cached result, marking it as the most recently used.
+
+        :param key: The key of the cached result.
+        :returns: The cached result, or None if it is not present.
+
+        """
+        with self._lock:
+            try:
+                result, _ = self._entries[key]
+            except KeyError:
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: Hashable, result, size: int):
+        """Add a result, evicting the least recently used results until
+        the cache is within its memory budget.
+
+        Results larger than the whole budget are not stored.
+
+        :param key: The key of the result.
+        :param result: The result to be stored.
+        :param size: The size of the result in bytes.
+
+        """
+        if size > self.max_bytes:
+            logger.info(f"Result of {size} bytes exceeds the cache budget.")
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (result, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                evicted_key, (_, evicted_size) = self._entries.popitem(
+                    last=False)
+                self.current_bytes -= evicted_size
+                logger.debug(f"Evicted cached session data: {evicted_key}")
+
+    def clear(self):
+        """Remove every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+SESSION_CACHE = SessionDataCache(max_bytes=config["SESSION_CACHE_BYTES"])
+
+NODE_DATAFILES = {}
+"""The datafiles referenced by a set of node files, keyed by the
+fingerprints of those files."""
+
+_NODE_DATAFILES_LOCK = threading.Lock()
+
+
+# ----------------------------------------------------------------------------
+# Cached Preparation
+# ----------------------------------------------------------------------------
+def prepare_files_for_bokeh(x_groups: List[GroupTypes],
+                            y_groups: List[GroupTypes],
+                            json_paths: List[str],
+                            cache: SessionDataCache = SESSION_CACHE,
+                            processes: int = None
+                            ) -> SessionData:
+    """Prepare the data and metadata of a set of node files, re-using a
+    cached result if those files have already been prepared with the
+    same groups.
+
+    :param x_groups: A user-given grouping query for X-axis values.
+    :param y_groups: A user-given grouping query for Y-axis values.
+    :param json_paths: A list of node .json file paths.
+    :param cache: The cache to be used.
+    :param processes: The number of worker processes used to prepare the
+        nodes if they are not cached, see ``prepare_nodes_for_bokeh``.
+    :returns: A ``(main_df, metadata_df, metadata_dict)`` tuple, as given
+        by ``prepare_nodes_for_bokeh``. The frames are copies of the
+        cached result, which may be given new columns or rows by the
+        session, see ``session_copy``. The metadata dictionary is shared
+        and read-only.
+
+    """
+    file_key = tuple(sorted(file_fingerprint(path) for path in json_paths))
+
+    # The datafiles are only known once the nodes have been read, these
+    # are kept for each set of node files.
+    nodes = None
+    with _NODE_DATAFILES_LOCK:
+        datafiles = NODE_DATAFILES.get(file_key)
+    if datafiles is None:
+        nodes = create_nodes_from_files(json_paths)
+        datafiles = node_datafiles(nodes)
+        with _NODE_DATAFILES_LOCK:
+            NODE_DATAFILES[file_key] = datafiles
+
+    key = (file_key,
+           tuple(datafile_fingerprint(path) for path in datafiles),
+           groups_fingerprint(x_groups, y_groups))
+
+    result = cache.get(key)
+    if result is not None:
+        logger.info(f"Session data loaded from the cache.")
+        return session_copy(result)
+
+    if nodes is None:
+        nodes = create_nodes_from_files(json_paths)
+    main_df, metadata_df, metadata_dict = prepare_nodes_for_bokeh(
+        x_groups=x_groups, y_groups=y_groups, nodes=nodes,
+        processes=processes)
+
+    # The column profiles are kept with the cached data frame, and so are
+    # shared by every session.
+    column_profile(main_df)
+
+    result = (main_df, metadata_df, types.MappingProxyType(metadata_dict))
+    cache.put(key, result, session_data_size(result))
+    return session_copy(result)
+
+
+def node_datafiles(nodes: List[Node]) -> Tuple[str, ...]:
+    """Get the datafile paths of every experiment of a list of nodes."""
+    return tuple(experiment.datafile for node in nodes
+                 for experiment in node.experiments or []
+                 if experiment.datafile is not None)
+
+
+def session_copy(session_data: SessionData) -> SessionData:
+    """Copy cached session data for use by a single session.
+
+    The copies share their column arrays with the cached frames (with
+    pandas copy-on-write, a modified column is copied first), but
+    columns added to the data frame or rows added to the metadata table
+    are not seen by other sessions. The cached column profiles are
+    given to the copy, these remain valid for the shared columns.
+
+    :param session_data: A cached ``(main_df, metadata_df, metadata)``
+        tuple.
+    :returns: A new tuple of the same form.
+
+    """
+    main_df, metadata_df, metadata_dict = session_data
+
+    session_df = main_df.copy(deep=False)
+    frame_store(session_df)["profiles"] = dict(
+        frame_store(main_df).get("profiles", {}))
+
+    session_metadata_df = MetadataTable(
+        codes=metadata_df.codes.copy(deep=False),
+        keys=metadata_df.keys.copy(deep=False))
+    return session_df, session_metadata_df, metadata_dict
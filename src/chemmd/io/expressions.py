@@ -0,0 +1,240 @@
+"""Arithmetic expressions over data frame columns.
+
+A ``DerivedGroup`` may be given an expression string in place of a Python
+callable, for example::
+
+    DerivedGroup("Al / OH", ("Total Aluminate Concentration",
+                             "Base Concentration"),
+                 "`Total Aluminate Concentration` / `Base Concentration`")
+
+Column names are written in backticks, or bare if they are valid Python
+identifiers. Numbers, the operators ``+ - * / // % **`` and the functions
+in ``FUNCTIONS`` may be used. Expressions are parsed once into a
+vectorized evaluator, no other Python code can be run by an expression.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports -- Standard Python modules
+# ----------------------------------------------------------------------------
+import ast
+import collections
+import functools
+import logging
+import operator
+import re
+from typing import Callable, Dict, NamedTuple, Tuple
+
+# ----------------------------------------------------------------------------
+# Imports -- Data science imports.
+# ----------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------------
+# Local package imports.
+# ----------------------------------------------------------------------------
+from ..models import DerivedGroup
+from .profiles import frame_store
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# Global Definitions
+# ----------------------------------------------------------------------------
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+NUMBER_NODES = (ast.Num, ) if hasattr(ast, "Num") else ()
+"""The number nodes of Python versions before ``ast.Constant``."""
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+FUNCTIONS = {
+    "abs": np.abs,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+}
+"""The functions that may be called within an expression."""
+
+RESULT_CACHE_SIZE = 64
+"""The number of evaluated expressions kept for each data frame. Results
+are kept in the ``frame_store`` of their data frame, so they are dropped
+with it."""
+
+
+class CompiledExpression(NamedTuple):
+    expression: str
+    """The expression string."""
+    columns: Tuple[str, ...]
+    """The names of the columns used by the expression."""
+    evaluator: Callable
+    """A function of a ``{column_name: array}`` dictionary."""
+
+
+# ----------------------------------------------------------------------------
+# Expression Functions
+# ----------------------------------------------------------------------------
+@functools.lru_cache(maxsize=256)
+def compile_expression(expression: str) -> CompiledExpression:
+    """Parse an expression string into a vectorized evaluator.
+
+    :param expression: An arithmetic expression over column names.
+    :returns: A ``CompiledExpression``.
+    :raises ValueError: If the expression contains anything other than
+        numbers, columns, operators and the allowed functions.
+
+    """
+    # Replace backtick column names with identifiers so that the
+    # expression can be parsed as Python.
+    quoted_names = {}
+
+    def quote(match):
+        identifier = f"__column_{len(quoted_names)}__"
+        quoted_names[identifier] = match.group(1)
+        return identifier
+
+    try:
+        tree = ast.parse(re.sub(r"`([^`]+)`", quote, expression),
+                         mode="eval")
+    except SyntaxError as error:
+        raise ValueError(f"Invalid expression {expression!r}: {error}")
+
+    columns = []
+
+    def build(node) -> Callable:
+        if isinstance(node, ast.Expression):
+            return build(node.body)
+
+        # Python 3.6 and 3.7 parse numbers as ``ast.Num``.
+        number = node.value if isinstance(node, ast.Constant) \
+            else node.n if isinstance(node, NUMBER_NODES) else None
+        if isinstance(number, (int, float)) \
+                and not isinstance(number, bool):
+            # Constants are evaluated as floats, so that an expression of
+            # constants alone (such as ``9**9**9``) cannot run Python's
+            # unbounded integer arithmetic.
+            value = np.float64(number)
+            return lambda arrays: value
+
+        if isinstance(node, ast.Name):
+            name = quoted_names.get(node.id, node.id)
+            columns.append(name)
+            return lambda arrays: arrays[name]
+
+        if isinstance(node, ast.BinOp) \
+                and type(node.op) in BINARY_OPERATORS:
+            function = BINARY_OPERATORS[type(node.op)]
+            left, right = build(node.left), build(node.right)
+            return lambda arrays: function(left(arrays), right(arrays))
+
+        if isinstance(node, ast.UnaryOp) \
+                and type(node.op) in UNARY_OPERATORS:
+            function = UNARY_OPERATORS[type(node.op)]
+            operand = build(node.operand)
+            return lambda arrays: function(operand(arrays))
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in FUNCTIONS and not node.keywords:
+            function = FUNCTIONS[node.func.id]
+            arguments = [build(argument) for argument in node.args]
+            return lambda arrays: function(*(argument(arrays)
+                                             for argument in arguments))
+
+        raise ValueError(f"Unsupported element {ast.dump(node)} "
+                         f"in expression {expression!r}.")
+
+    evaluator = build(tree)
+    return CompiledExpression(expression=expression,
+                              columns=tuple(dict.fromkeys(columns)),
+                              evaluator=evaluator)
+
+
+def column_version(array: np.ndarray) -> Tuple:
+    """Identify the memory and layout of an array."""
+    return (array.__array_interface__["data"][0], array.shape,
+            array.strides, array.dtype.str)
+
+
+def evaluate_expression(expression: str,
+                        data_frame: pd.DataFrame) -> np.ndarray:
+    """Evaluate an expression over the columns of a data frame.
+
+    Each column is read as an array without copying the frame. Results
+    are kept with the data frame, keyed by the expression and the
+    versions of its input columns, so the data frame columns should not
+    be modified in place.
+
+    :param expression: An arithmetic expression over column names.
+    :param data_frame: The data frame holding the columns used.
+    :returns: A read-only array of the result.
+
+    """
+    compiled = compile_expression(expression)
+    arrays = {name: data_frame[name].to_numpy()
+              for name in compiled.columns}
+
+    results = frame_store(data_frame).setdefault(
+        "expressions", collections.OrderedDict())
+    key = (expression, tuple(column_version(arrays[name])
+                             for name in compiled.columns))
+    try:
+        results.move_to_end(key)
+        result, _ = results[key]
+        logger.debug(f"Expression result loaded from cache: {expression}")
+        return result
+    except KeyError:
+        pass
+
+    result = np.asarray(compiled.evaluator(arrays))
+    if result.ndim == 0:
+        result = np.full(len(data_frame), result)
+    result.setflags(write=False)
+
+    # The inputs are held with the result so that their memory cannot be
+    # re-used by another column of the frame while the result is kept.
+    results[key] = (result, arrays)
+    if len(results) > RESULT_CACHE_SIZE:
+        results.popitem(last=False)
+
+    return result
+
+
+def expression_group(column_name: str, expression: str) -> DerivedGroup:
+    """Create a ``DerivedGroup`` from an expression string, as can be
+    given in a ``gq.json`` file.
+
+    :param column_name: The name of the column to be created.
+    :param expression: An arithmetic expression over column names.
+    :returns: A ``DerivedGroup`` whose source names are the columns used
+        by the expression.
+
+    """
+    compiled = compile_expression(expression)
+    return DerivedGroup(column_name, compiled.columns, expression)
+
+
+def derived_groups_from_json(group_data: Dict) -> Tuple[DerivedGroup, ...]:
+    """Create the expression ``DerivedGroup``s of a ``gq.json`` file.
+
+    These are read from its optional ``derived_groups`` entry, a list of
+    ``{"column_name": ..., "expression": ...}`` objects.
+
+    :param group_data: The contents of a ``gq.json`` file.
+    :returns: A tuple of ``DerivedGroup`` objects.
+
+    """
+    return tuple(expression_group(item["column_name"], item["expression"])
+                 for item in group_data.get("derived_groups", []))
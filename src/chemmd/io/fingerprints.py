@@ -0,0 +1,128 @@
+"""Fingerprints of the inputs of prepared session data.
+
+Cached results are keyed by what they were computed from: the node
+files, the datafiles those nodes reference, and the query groups. A
+change to any of these gives a new fingerprint, so a stale result is
+never returned.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports -- Standard Python Library
+# ----------------------------------------------------------------------------
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import List
+
+# ----------------------------------------------------------------------------
+# Local package imports.
+# ----------------------------------------------------------------------------
+from .. import config
+from ..models import GroupTypes
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# Global Definitions
+# ----------------------------------------------------------------------------
+FILE_DIGESTS_SIZE = 4096
+"""The number of file digests kept by ``FILE_DIGESTS``."""
+
+FILE_DIGESTS = collections.OrderedDict()
+"""File content digests, keyed by the path, modification time and size
+of each file, so that an unchanged file is only read once."""
+
+_FILE_DIGESTS_LOCK = threading.Lock()
+
+
+# ----------------------------------------------------------------------------
+# Fingerprint Functions
+# ----------------------------------------------------------------------------
+def file_fingerprint(path: str) -> str:
+    """Create a fingerprint of the contents of a file.
+
+    The file is only read again if its modification time or size has
+    changed since it was last fingerprinted.
+
+    :param path: The path of the file to be read.
+    :returns: The hex digest of the sha1 hash of the file contents.
+
+    """
+    status = os.stat(path)
+    key = (os.path.abspath(path), status.st_mtime_ns, status.st_size)
+
+    with _FILE_DIGESTS_LOCK:
+        if key in FILE_DIGESTS:
+            FILE_DIGESTS.move_to_end(key)
+            return FILE_DIGESTS[key]
+
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(65536), b""):
+            digest.update(block)
+
+    with _FILE_DIGESTS_LOCK:
+        FILE_DIGESTS[key] = digest.hexdigest()
+        if len(FILE_DIGESTS) > FILE_DIGESTS_SIZE:
+            FILE_DIGESTS.popitem(last=False)
+    return digest.hexdigest()
+
+
+def datafile_fingerprint(path: str,
+                         base_path: str = config["BASE_PATH"],
+                         mode: str = config["CSV_READ_MODE"]) -> str:
+    """Create a fingerprint of a datafile referenced by an experiment.
+
+    Datafiles are found as by ``models.util.load_csv_as_dict``. Remote
+    datafiles are not downloaded, their URL is used in place of their
+    contents.
+
+    :param path: The datafile path of an experiment.
+    :param base_path: The path prepended to local datafile paths.
+    :param mode: Either "LOCAL" or "REMOTE".
+    :returns: A string that changes whenever the datafile changes.
+
+    """
+    if mode == "LOCAL":
+        return file_fingerprint(os.path.join(base_path, path))
+    return path
+
+
+def describe_callable(function) -> List:
+    """Describe a callable by its code, constants and captured values.
+
+    Two lambdas share the ``<lambda>`` name, so the name alone cannot
+    tell derived groups apart.
+
+    """
+    code = getattr(function, "__code__", None)
+    name = [getattr(function, "__module__", None),
+            getattr(function, "__qualname__", repr(function))]
+    if code is None:
+        return name
+
+    closure = [cell.cell_contents for cell in function.__closure__ or ()]
+    return name + [code.co_code.hex(), repr(code.co_consts),
+                   repr(code.co_names), repr(closure),
+                   repr(function.__defaults__)]
+
+
+def groups_fingerprint(x_groups: List[GroupTypes],
+                       y_groups: List[GroupTypes]) -> str:
+    """Create a canonical fingerprint of a pair of group lists.
+
+    Groups read from a ``gq.json`` file (lists) and those created as
+    ``QueryGroup`` objects (tuples) give the same fingerprint.
+
+    :param x_groups: A user-given grouping query for X-axis values.
+    :param y_groups: A user-given grouping query for Y-axis values.
+    :returns: The hex digest of the sha1 hash of the groups.
+
+    """
+    text = json.dumps([list(x_groups), list(y_groups)],
+                      default=describe_callable)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
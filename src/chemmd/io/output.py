@@ -1,69 +1,485 @@
 # ----------------------------------------------------------------------------
 # Imports -- Standard Python Library
 # ----------------------------------------------------------------------------
+import functools
 import itertools
 import logging
+import multiprocessing
+import multiprocessing.pool
 import re
-from typing import List, Tuple, Dict
+import threading
+from dataclasses import dataclass
+from typing import List, Tuple, Dict, Iterator, NamedTuple
 
 # ----------------------------------------------------------------------------
 # Imports -- Data science imports.
 # ----------------------------------------------------------------------------
+import numpy as np
 import pandas as pd
 
 # ----------------------------------------------------------------------------
 # Local package imports.
 # ----------------------------------------------------------------------------
-from ..models import Node, QueryGroup
-from ..models.util import create_uuid
+from .. import config
+from ..models import Node, QueryGroup, ScalarColumn
+from ..models.util import create_uuid, get_all_elements
+from . import transforms
+from . import units
 
 logger = logging.getLogger(__name__)
 
+METADATA_LEVELS = ("experiment", "sample", "source")
+"""The nodal objects that make up each metadata key."""
+
+
+@dataclass
+class MetadataTable:
+    """Integer coded metadata keys for the rows of a data frame.
+
+    Each distinct (experiment, sample, source) uuid combination is stored
+    once in ``keys``. The ``codes`` frame has one int32 column per data
+    column, each entry being the row of ``keys`` that describes that
+    value. Rows with no metadata are given a code of -1.
+
+    """
+    codes: pd.DataFrame
+    """An int32 data frame of codes aligned with the main data frame."""
+    keys: pd.DataFrame
+    """The distinct metadata keys, indexed by code."""
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.codes.columns
+
+    def resolve(self, index_selections: List[int]) -> np.ndarray:
+        """Get the metadata key tuples of the selected rows.
+
+        :param index_selections: A list of row positions.
+        :returns: An object array with a row per selection and a column
+            per data column, each entry being a key tuple.
+
+        """
+        # The empty key is appended so that a code of -1 resolves to it.
+        key_tuples = np.empty(len(self.keys) + 1, dtype=object)
+        key_tuples[:] = list(self.keys.itertuples(index=False, name=None)) \
+            + [(None, ) * len(METADATA_LEVELS)]
+        codes = self.codes.iloc[index_selections, :].values
+        return key_tuples[codes]
+
+    def resolve_distinct(self, index_selections: List[int]) -> np.ndarray:
+        """Get the distinct rows of metadata key tuples of the selected
+        rows, in the order they are first selected.
+
+        Large selections typically share a few metadata rows, these are
+        found from the integer codes before any key tuple is built.
+
+        :param index_selections: A list of row positions.
+        :returns: An object array with a row per distinct selection and a
+            column per data column, each entry being a key tuple.
+
+        """
+        codes = self.codes.iloc[index_selections, :].values
+        _, first = np.unique(codes, axis=0, return_index=True)
+        return self.resolve(np.asarray(index_selections)[np.sort(first)])
+
+    def extend(self, other: "MetadataTable"):
+        """Append the rows of another table to this one.
+
+        The codes and keys are written into arrays that grow by doubling,
+        so extending a table batch by batch takes time proportional to
+        the rows added, rather than copying every earlier row each time.
+
+        :param other: A table whose codes index into the same (or a
+            larger) set of keys, such as those given by
+            ``stream_nodes_for_bokeh``. Only its keys with a code beyond
+            those of this table are added.
+
+        """
+        code_rows = other.codes.to_numpy(dtype=np.int32)
+        new_keys = other.keys.loc[other.keys.index >= len(self.keys)]
+
+        self._code_buffer = append_rows(
+            self._buffer("_code_buffer", self.codes, np.int32),
+            len(self.codes), code_rows)
+        self._key_buffer = append_rows(
+            self._buffer("_key_buffer", self.keys, object),
+            len(self.keys), new_keys.to_numpy(dtype=object))
+
+        # The frames are views of the filled part of each buffer.
+        self.codes = pd.DataFrame(
+            self._code_buffer[:len(self.codes) + len(code_rows)],
+            columns=self.codes.columns, copy=False)
+        self.keys = pd.DataFrame(
+            self._key_buffer[:len(self.keys) + len(new_keys)],
+            columns=self.keys.columns, dtype=object, copy=False)
+        self._views = (self.codes, self.keys)
+
+    def _buffer(self, name: str, frame: pd.DataFrame, dtype) -> np.ndarray:
+        """Get a growable buffer holding the rows of a frame, starting a
+        new one if the frames have been replaced since the last extend."""
+        codes_view, keys_view = getattr(self, "_views", (None, None))
+        if codes_view is self.codes and keys_view is self.keys:
+            return getattr(self, name)
+        return frame.to_numpy(dtype=dtype)
+
+
+class Aggregation(NamedTuple):
+    x_column: str
+    """The continuous column to be binned."""
+    by: str = None
+    """An optional discrete column (eg. Counter Ion) to group by."""
+    bins: int = 50
+    """The number of equal width bins of ``x_column``."""
+
+
+FLOAT32_TOLERANCE = 1e-6
+"""The largest relative error allowed by storing a value as float32."""
+
 
 def prepare_nodes_for_bokeh(x_groups: List[QueryGroup],
                             y_groups: List[QueryGroup],
-                            nodes: List[Node]
-                            ) -> Tuple[pd.DataFrame, pd.DataFrame, dict]:
+                            nodes: List[Node],
+                            processes: int = None,
+                            aggregation: Aggregation = None,
+                            float32: bool = config["FLOAT32_COLUMNS"]
+                            ) -> Tuple[pd.DataFrame, MetadataTable, dict]:
     """Prepare a main pd.DataFrame and a metadata ChainMap from a
     list of ``Node`` objects.
 
     :param x_groups: A user-given grouping query for X-axis values.
     :param y_groups: A user-given grouping query for Y-axis values.
     :param nodes: A list of Node objects to apply the group queries to.
-    :returns: A populated pd.DataFrame and a ChainMap with all the
-        data and metadata requested by the given  groups from the
-        given nodes.
+    :param processes: If given, the experiments are mapped by a shared
+        pool of this many worker processes, see ``worker_pool``. The
+        result is identical to that of the serial mapping.
+    :param aggregation: If given, summary statistics of the binned data
+        are returned in place of every value, see
+        ``aggregate_session_data``.
+    :param float32: Whether float columns may be stored as float32 where
+        no value loses precision, see ``compact_columns``.
+    :returns: A populated pd.DataFrame, a ``MetadataTable`` of the
+        metadata keys of each value, and a dictionary of the metadata
+        objects for those keys.
 
     """
-    cds_frames = []
+    experiment_columns = []
     metadata_dict = {}
+    key_codes = {}
+    groups = x_groups + y_groups
+
+    if processes is None:
+        experiments = map_experiments(groups, nodes, key_codes)
+    else:
+        experiments = map_experiments_in_pool(groups, nodes, key_codes,
+                                              processes)
+
+    for data, metadata_codes, metadata in experiments:
+        experiment_columns.append((data, metadata_codes))
+        metadata_dict.update(metadata)
+
+    # Build each output frame from one pre-sized array per column, rather
+    # than concatenating a frame for each experiment.
+    main_df = assemble_columns([data for data, _ in experiment_columns])
+    codes = assemble_columns([codes for _, codes in experiment_columns],
+                             dtype=np.int32, fill_value=-1)
+    metadata_df = MetadataTable(codes=codes, keys=key_table(key_codes))
+
+    if aggregation is not None:
+        main_df, metadata_df = aggregate_session_data(
+            main_df, metadata_df, aggregation,
+            y_columns=[group.column_name for group in y_groups])
+
+    main_df = compact_columns(main_df, float32=float32)
+
+    return main_df, metadata_df, metadata_dict
+
+
+def stream_nodes_for_bokeh(x_groups: List[QueryGroup],
+                           y_groups: List[QueryGroup],
+                           nodes: List[Node],
+                           float32: bool = config["FLOAT32_COLUMNS"]
+                           ) -> Iterator[Tuple[pd.DataFrame,
+                                               MetadataTable,
+                                               dict]]:
+    """Prepare the data and metadata of a list of ``Node`` objects one
+    experiment at a time.
+
+    This is a streaming version of ``prepare_nodes_for_bokeh``, each
+    experiment is yielded as soon as it has been mapped so the first
+    values can be displayed before the rest are read.
+
+    Every batch has a column for each group, in group order, and its
+    index continues from the previous batch. The codes of each batch
+    index into the keys of all batches so far, but each batch only holds
+    the keys it adds (indexed by their code), so the tables must be
+    combined in order with ``MetadataTable.extend``.
+
+    :param x_groups: A user-given grouping query for X-axis values.
+    :param y_groups: A user-given grouping query for Y-axis values.
+    :param nodes: A list of Node objects to apply the group queries to.
+    :param float32: Whether float columns may be stored as float32, see
+        ``compact_columns``. Discrete columns are joined into strings but
+        not made categorical, as each batch has its own categories.
+    :returns: An iterator of ``(data_frame, metadata_table, metadata)``
+        tuples, where ``metadata`` holds the metadata objects first
+        referenced by that batch.
+
+    """
+    key_codes = {}
     groups = x_groups + y_groups
+    column_names = [group.column_name for group in groups]
+    offset = 0
+    known_keys = 0
+
+    for data, metadata_codes, metadata in map_experiments(groups, nodes,
+                                                          key_codes):
+        batch_df = assemble_columns([data], column_names=column_names)
+        if batch_df.empty:
+            continue
+        batch_df = compact_columns(batch_df, float32=float32,
+                                   categorical=False)
+
+        codes = assemble_columns([metadata_codes], column_names=column_names,
+                                 dtype=np.int32, fill_value=-1)
+
+        # Continue the index from the previous batch.
+        batch_index = pd.RangeIndex(offset, offset + len(batch_df))
+        batch_df.index = batch_index
+        codes.index = batch_index
+        offset += len(batch_df)
 
+        # Only the keys first referenced by this batch are built.
+        keys = key_table(key_codes, start=known_keys)
+        known_keys = len(key_codes)
+
+        yield (batch_df, MetadataTable(codes=codes, keys=keys), metadata)
+
+
+def map_experiments(groups: List[QueryGroup], nodes: List[Node],
+                    key_codes: Dict) -> Iterator[Tuple[Dict, Dict, Dict]]:
+    """Apply the given groups to every experiment of the given nodes.
+
+    :param groups: A list of query group objects.
+    :param nodes: A list of Node objects to apply the group queries to.
+    :param key_codes: A dictionary of metadata key codes, see
+        ``encode_metadata_keys``.
+    :returns: An iterator of ``(data, metadata_codes, metadata)`` tuples,
+        one per experiment.
+
+    """
     for node in nodes:
         for exp in node.experiments:
             mapping = exp.species_factor_mapping(node)
             group_mapping = create_group_mapping(mapping, groups)
-            data, metadata = group_mapping_as_df(group_mapping)
-            cds_frames.append(pd.DataFrame(data))
-            metadata_dict = {**metadata_dict, **metadata}
+            data, metadata_keys, metadata = group_mapping_as_columns(
+                group_mapping)
+            metadata_codes = encode_metadata_keys(metadata_keys, key_codes)
+            yield data, metadata_codes, metadata
 
-    # Concatenate all the data frames together and reset the index.
-    main_df = pd.concat(cds_frames, sort=False)
-    main_df = main_df.reset_index(drop=True)
 
-    # The main_data_frame comes with metadata - data column pairs. Split
-    # these columns and return two different data frames.
-    metadata_df = main_df.xs("metadata", axis=1)
-    main_df = main_df.xs("data", axis=1)
+def map_experiments_in_pool(groups: List[QueryGroup], nodes: List[Node],
+                            key_codes: Dict, processes: int
+                            ) -> Iterator[Tuple[Dict, Dict, Dict]]:
+    """Apply the given groups to every experiment of the given nodes with
+    a pool of worker processes.
+
+    Each task is a single node and the groups, its experiments are all
+    mapped by one worker. Workers return their columns as arrays, and
+    locate the metadata objects by their position within the experiment
+    rather than returning them. Results are merged in experiment order,
+    so the output matches that of ``map_experiments``.
+
+    :param groups: A list of query group objects.
+    :param nodes: A list of Node objects to apply the group queries to.
+    :param key_codes: A dictionary of metadata key codes, see
+        ``encode_metadata_keys``.
+    :param processes: The number of worker processes, see
+        ``worker_pool``.
+    :returns: An iterator of ``(data, metadata_codes, metadata)`` tuples,
+        one per experiment.
+
+    """
+    # imap returns the results in the order of the nodes.
+    results = worker_pool(processes).imap(
+        functools.partial(map_node_in_worker, groups=groups), nodes)
+
+    for node, node_results in zip(nodes, results):
+        for experiment, result in zip(node.experiments, node_results):
+            data, metadata_keys, metadata_locators = result
+            metadata = {nodal_uuid: locate_metadata(experiment, locator)
+                        for nodal_uuid, locator in metadata_locators.items()}
+            metadata_codes = encode_metadata_keys(metadata_keys, key_codes)
+            yield data, metadata_codes, metadata
+
+
+WORKER_POOLS = {}
+"""Worker process pools of ``map_experiments_in_pool``, keyed by their
+number of processes."""
+
+_WORKER_POOLS_LOCK = threading.Lock()
+
+
+def worker_pool(processes: int) -> multiprocessing.pool.Pool:
+    """Get the worker pool of a number of processes, starting it when it
+    is first requested.
+
+    Pools are shared by every session of the server. Their workers are
+    started with "spawn", as forking the threaded bokeh server is not
+    safe.
+
+    :param processes: The number of worker processes.
+
+    """
+    with _WORKER_POOLS_LOCK:
+        if processes not in WORKER_POOLS:
+            WORKER_POOLS[processes] = multiprocessing.get_context(
+                "spawn").Pool(processes)
+            logger.info(f"Worker pool of {processes} processes started.")
+        return WORKER_POOLS[processes]
+
+
+def map_node_in_worker(node: Node, groups: List[QueryGroup]
+                       ) -> List[Tuple[Dict, Dict, Dict]]:
+    """Map every experiment of a node within a worker process.
+
+    :param node: The node to be mapped.
+    :param groups: A list of query group objects.
+    :returns: The data and metadata key columns of each experiment, and a
+        dictionary of ``{uuid: locator}`` for its metadata objects.
+
+    """
+    results = []
+    for experiment in node.experiments:
+        mapping = experiment.species_factor_mapping(node)
+        group_mapping = create_group_mapping(mapping, groups)
+        data, metadata_keys, metadata = group_mapping_as_columns(
+            group_mapping)
+
+        # Arrays are far cheaper to send back than lists of Python floats.
+        data = {key: values if isinstance(values, ScalarColumn)
+                else np.asarray(values)
+                for key, values in data.items()}
+        metadata_locators = {nodal_uuid: metadata_locator(experiment, nodal)
+                             for nodal_uuid, nodal in metadata.items()}
+        results.append((data, metadata_keys, metadata_locators))
+    return results
+
+
+def metadata_locator(experiment, nodal_object) -> Tuple:
+    """Find the position of a metadata object within an experiment.
+
+    :param experiment: The experiment the object was mapped from.
+    :param nodal_object: The experiment, or one of its samples or
+        sources.
+    :returns: A tuple that can be given to ``locate_metadata``.
+
+    """
+    if nodal_object is experiment:
+        return ("experiment", )
+
+    samples = experiment.samples + experiment.parental_samples
+    for sample_index, sample in enumerate(samples):
+        if nodal_object is sample:
+            return ("sample", sample_index)
+
+        sources = get_all_elements(sample, "all_sources")
+        for source_index, source in enumerate(sources):
+            if nodal_object is source:
+                return ("source", sample_index, source_index)
+
+    raise ValueError(f"{nodal_object} is not part of {experiment.name}.")
+
+
+def locate_metadata(experiment, locator: Tuple):
+    """Get the metadata object at the position given by
+    ``metadata_locator``.
+
+    :param experiment: The experiment the object was mapped from.
+    :param locator: The position tuple of the object.
+    :returns: The experiment, sample or source at that position.
+
+    """
+    nodal, *indexes = locator
+
+    if nodal == "experiment":
+        return experiment
+
+    samples = experiment.samples + experiment.parental_samples
+    sample = samples[indexes[0]]
+    if nodal == "sample":
+        return sample
+
+    return get_all_elements(sample, "all_sources")[indexes[1]]
 
-    return main_df, metadata_df, metadata_dict
+
+def key_table(key_codes: Dict, start: int = 0) -> pd.DataFrame:
+    """Build the metadata key table of a dictionary of key codes.
+
+    :param key_codes: A dictionary of ``{key_tuple: code}``.
+    :param start: Only keys with this code or above are included. Codes
+        are given in insertion order, so these are taken by position.
+    :returns: A data frame with a row per key, indexed by its code.
+
+    """
+    keys = list(itertools.islice(key_codes, start, None))
+    return pd.DataFrame(keys, columns=METADATA_LEVELS, dtype=object,
+                        index=pd.RangeIndex(start, len(key_codes)))
+
+
+def append_rows(buffer: np.ndarray, size: int,
+                rows: np.ndarray) -> np.ndarray:
+    """Write rows after the first ``size`` rows of a buffer.
+
+    If the buffer is too small, a buffer of at least twice the size is
+    allocated and the filled rows are copied into it.
+
+    :param buffer: A 2d array, of which ``size`` rows are filled.
+    :param size: The number of filled rows.
+    :param rows: The rows to be written.
+    :returns: The buffer the rows were written to.
+
+    """
+    if size + len(rows) > len(buffer):
+        grown = np.empty((max(2 * len(buffer), size + len(rows)), )
+                         + buffer.shape[1:], dtype=buffer.dtype)
+        grown[:size] = buffer[:size]
+        buffer = grown
+    buffer[size:size + len(rows)] = rows
+    return buffer
+
+
+def encode_metadata_keys(metadata_columns: Dict, key_codes: Dict) -> Dict:
+    """Replace the metadata key tuples of each column with integer codes.
+
+    :param metadata_columns: A dictionary of metadata key columns from
+        ``group_mapping_as_columns``.
+    :param key_codes: A dictionary of ``{key_tuple: code}``. New keys are
+        added to it, so the same dictionary should be given for every
+        experiment.
+    :returns: A dictionary of code columns, keyed by column name.
+
+    """
+    def encode(key):
+        return key_codes.setdefault(key, len(key_codes))
+
+    code_columns = {}
+    for column_name, keys in metadata_columns.items():
+        if isinstance(keys, ScalarColumn):
+            code_columns[column_name] = ScalarColumn(encode(keys.value),
+                                                     keys.size)
+        else:
+            code_columns[column_name] = [encode(key) for key in keys]
+    return code_columns
 
 
 def create_group_mapping(mapping: Dict, groups: List[QueryGroup]) -> Dict:
     """Create a dictionary mapping based on the given mapping and query
     group.
 
-    :param mapping: A dictionary from `chemmd.models.Experiment.species_factor_mapping`.
+    :param mapping: A mapping from `chemmd.models.Experiment.species_factor_mapping`.
     :param groups: A list of query group objects.
     :returns: A QueryGroup based dictionary mapping of the original
         mapping provided.
@@ -92,9 +508,12 @@ def create_group_mapping(mapping: Dict, groups: List[QueryGroup]) -> Dict:
 
                 # If the species and unit filters match, add the data to the output
                 # and break out of this loop.
-                if group_species_matches and metadata["factor"].query(group.factor_filters):
-                    metadata["species_keys"] = list(group_species_matches)
-                    group_mapping[group] = metadata
+                if group_species_matches and factor_matches(metadata["factor"],
+                                                            group.factor_filters):
+                    # The same metadata may match several groups, so the
+                    # matched species are added to a copy.
+                    group_mapping[group] = {
+                        **metadata, "species_keys": list(group_species_matches)}
 
                     logger.debug(f"Match found: {metadata['factor'].label}")
 
@@ -116,17 +535,41 @@ def create_group_mapping(mapping: Dict, groups: List[QueryGroup]) -> Dict:
     return group_mapping
 
 
-def group_mapping_as_df(group_mapping: Dict) -> Tuple[pd.DataFrame, Dict]:
-    """Convert a given group_mapping to a pandas data frame object.
+def factor_matches(factor, factor_filters) -> bool:
+    """Check if a factor matches the factor filters of a group, either
+    directly or after a unit conversion.
 
-    :param group_mapping:
-    :returns:
+    :param factor: A ``Factor`` instance.
+    :param factor_filters: The factor filters of a query group.
+    :returns: True if the factor matches, False otherwise.
+
+    """
+    if factor.query(factor_filters):
+        return True
+    return units.conversion_target(factor, factor_filters) is not None
+
+
+def group_mapping_as_columns(group_mapping: Dict
+                             ) -> Tuple[Dict, Dict, Dict]:
+    """Convert a given group_mapping to data and metadata key columns.
+
+    Constant values are left as ``ScalarColumn`` objects so that they
+    can be written directly into the final arrays.
+
+    :param group_mapping: A dictionary from ``create_group_mapping``.
+    :returns: A dictionary of data columns, a dictionary of metadata
+        key columns, both keyed by column name, and a dictionary of the
+        metadata objects keyed by their uuid.
 
     """
     data_dict = {}
+    metadata_columns = {}
     metadata_dict = {}
 
-    # grouping_dict = apply_transform(group_mapping)
+    # Convert units before the transforms, as these are registered
+    # against the target units.
+    group_mapping = units.normalize_units(group_mapping)
+    group_mapping = transforms.apply_transforms(group_mapping)
 
     # For each group and its matches.
     for group, grouping_dict in group_mapping.items():
@@ -136,7 +579,7 @@ def group_mapping_as_df(group_mapping: Dict) -> Tuple[pd.DataFrame, Dict]:
         # Get each of the nodal objects associated with this group
         # mapping match, get their UUIDs and add them to the metadata
         # dictionary.
-        for nodal in ("experiment", "sample", "source"):
+        for nodal in METADATA_LEVELS:
             try:
                 nodal_object = grouping_dict[nodal]
                 nodal_uuid = create_uuid(nodal_object)
@@ -150,27 +593,325 @@ def group_mapping_as_df(group_mapping: Dict) -> Tuple[pd.DataFrame, Dict]:
         try:
             # Load this factors data into the data_dict.
             factor_data = grouping_dict["factor_data"]
-            data_dict[("data", group.column_name)] = factor_data
-            # Add an array of metadata keys of matching length.
-            metadata_keys = [tuple(metadata_keys), ] * len(factor_data)
-            data_dict[("metadata", group.column_name)] = metadata_keys
+            data_dict[group.column_name] = factor_data
+            # Add a column of metadata keys of matching length.
+            metadata_keys = ScalarColumn(tuple(metadata_keys), len(factor_data))
+            metadata_columns[group.column_name] = metadata_keys
 
         except KeyError:
             # A KeyError here means that there is no factor data, in this
             # case that means there should be species data to extract instead.
-            data_dict[("data", group.column_name)] = grouping_dict["species_data"]
+            data_dict[group.column_name] = grouping_dict["species_data"]
             metadata_keys = [tuple(metadata_keys), ]
-            data_dict[("metadata", group.column_name)] = metadata_keys
+            metadata_columns[group.column_name] = metadata_keys
 
     try:
         # Ensure all the data sets are of the same (longest) length.
         factor_size = max(len(values) for values in data_dict.values())
-        for key, value in data_dict.items():
-            if len(value) == 1:
-                data_dict[key] = value * factor_size
+        for columns in (data_dict, metadata_columns):
+            for key, value in columns.items():
+                if len(value) == 1:
+                    columns[key] = broadcast_values(value, factor_size)
     except ValueError:
         pass
 
+    return data_dict, metadata_columns, metadata_dict
+
+
+def group_mapping_as_df(group_mapping: Dict) -> Tuple[pd.DataFrame, Dict]:
+    """Convert a given group_mapping to a pandas data frame object.
+
+    :param group_mapping: A dictionary from ``create_group_mapping``.
+    :returns: A data frame with ("data", column) and ("metadata", column)
+        column pairs, and a dictionary of the metadata objects keyed by
+        their uuid.
+
+    """
+    data, metadata_keys, metadata_dict = group_mapping_as_columns(
+        group_mapping)
+
+    data_dict = {}
+    for column_name in data:
+        data_dict[("data", column_name)] = data[column_name]
+        data_dict[("metadata", column_name)] = metadata_keys[column_name]
+
+    # Scalar columns are only built now that the frame is being created.
+    data_dict = {key: value.as_array() if isinstance(value, ScalarColumn)
+                 else value
+                 for key, value in data_dict.items()}
+
     # Convert the data dict into a data frame and return it.
     df = pd.DataFrame(data_dict)
     return df, metadata_dict
+
+
+def assemble_columns(column_dicts: List[Dict], column_names: List[str] = None,
+                     dtype=None, fill_value=np.nan) -> pd.DataFrame:
+    """Stack the columns of several experiments into a single data frame.
+
+    The total length of each column is known from the experiments row
+    counts, so each column is allocated once and every experiment's
+    values are written into its slice. Rows of experiments that lack a
+    column are left as ``NaN``.
+
+    :param column_dicts: A list of ``{column_name: values}`` dictionaries,
+        as returned by ``group_mapping_as_columns``.
+    :param column_names: The columns of the returned frame. If not given
+        every column found is used, ordered by its first appearance.
+    :param dtype: The dtype of every column. If not given it is found
+        from the values of each column.
+    :param fill_value: The value of rows missing from a column, only
+        used when ``dtype`` is given.
+    :returns: A data frame with a default integer index.
+
+    """
+    sizes = [max((len(values) for values in columns.values()), default=0)
+             for columns in column_dicts]
+    offsets = np.concatenate(([0], np.cumsum(sizes, dtype=int)))
+    total_size = int(offsets[-1])
+
+    if column_names is None:
+        # Columns are ordered by their first appearance.
+        column_names = list(dict.fromkeys(itertools.chain.from_iterable(
+            column_dicts)))
+
+    frame_columns = {}
+    for column_name in column_names:
+
+        parts = [(offsets[index], columns[column_name])
+                 for index, columns in enumerate(column_dicts)
+                 if column_name in columns]
+        parts = [(start, values if isinstance(values, ScalarColumn)
+                  else np.asarray(values))
+                 for start, values in parts]
+
+        if dtype is not None:
+            array = np.full(total_size, fill_value, dtype=dtype)
+        else:
+            is_complete = sum(len(values) for _, values in parts) == total_size
+            array = allocate_column([values for _, values in parts],
+                                    total_size, is_complete)
+
+        for start, values in parts:
+            stop = start + len(values)
+            if isinstance(values, ScalarColumn):
+                array[start:stop].fill(values.value)
+            elif array.dtype == object and values.ndim > 1:
+                # Nested values (such as lists of species) must be placed
+                # one row at a time so they are not broadcast.
+                for offset, value in enumerate(values.tolist()):
+                    array[start + offset] = value
+            else:
+                array[start:stop] = values
+
+        frame_columns[column_name] = array
+
+    return pd.DataFrame(frame_columns, index=pd.RangeIndex(total_size),
+                        copy=False)
+
+
+def allocate_column(parts: List, size: int,
+                    is_complete: bool) -> np.ndarray:
+    """Allocate an output array able to hold each of the given parts.
+
+    :param parts: The ``ScalarColumn`` and array values of one column.
+    :param size: The total length of the column.
+    :param is_complete: False if some rows will receive no values.
+    :returns: An array of ``size`` filled with ``NaN``, or an empty
+        array if every row will be written.
+
+    """
+    dtypes = []
+    for values in parts:
+        if isinstance(values, ScalarColumn):
+            if isinstance(values.value, bool) \
+                    or not isinstance(values.value, (int, float)):
+                dtypes = None
+                break
+            dtypes.append(np.asarray(values.value).dtype)
+        elif values.dtype.kind in "iuf" and values.ndim == 1:
+            dtypes.append(values.dtype)
+        else:
+            dtypes = None
+            break
+
+    if dtypes is None:
+        array = np.empty(size, dtype=object)
+        if not is_complete:
+            array.fill(np.nan)
+        return array
+
+    if is_complete:
+        return np.empty(size, dtype=np.result_type(*dtypes))
+    return np.full(size, np.nan, dtype=np.result_type(np.float64, *dtypes))
+
+
+def broadcast_values(values, size: int) -> ScalarColumn:
+    """Broadcast a length-one column of values to the given size.
+
+    :param values: A list or ``ScalarColumn`` of length one.
+    :param size: The length of the column to be returned.
+    :returns: A ``ScalarColumn`` of the given size.
+
+    """
+    if isinstance(values, ScalarColumn):
+        return values.resized(size)
+    return ScalarColumn(values[0], size)
+
+
+def is_discrete(series: pd.Series) -> bool:
+    """Whether a column holds discrete (string or list) values, either as
+    objects, strings or a categorical."""
+    return series.dtype == object \
+        or isinstance(series.dtype, (pd.CategoricalDtype, pd.StringDtype))
+
+
+def discrete_values(series: pd.Series) -> pd.Series:
+    """Make the values of a discrete column hashable.
+
+    Species columns hold lists of species, which cannot be grouped on or
+    factorized. These are joined into strings, other values are kept.
+    Categorical columns are returned as plain object columns.
+
+    :param series: A discrete column.
+    :returns: A series of hashable values.
+
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(object)
+    return series.map(lambda value: ", ".join(value)
+                      if isinstance(value, list) else value)
+
+
+def float32_safe(values: np.ndarray) -> bool:
+    """Whether a float array can be stored as float32 without a visible
+    loss of precision.
+
+    Every finite value must lie within the float32 range, integral
+    values must be kept exactly, and all others must round trip to within
+    ``FLOAT32_TOLERANCE`` of their value. Values too small for a normal
+    float32 would fail the last test.
+
+    :param values: A float64 array.
+
+    """
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return True
+    if np.abs(finite).max() > np.finfo(np.float32).max:
+        return False
+
+    round_trip = finite.astype(np.float32).astype(np.float64)
+    is_integral = finite == np.round(finite)
+    if not np.array_equal(round_trip[is_integral], finite[is_integral]):
+        return False
+    return bool(np.all(np.abs(round_trip - finite)
+                       <= FLOAT32_TOLERANCE * np.abs(finite)))
+
+
+def compact_columns(data_frame: pd.DataFrame, float32: bool = True,
+                    categorical: bool = True) -> pd.DataFrame:
+    """Store each column of a data frame in its narrowest safe form.
+
+    + Float columns become float32 where ``float32_safe`` allows, which
+      halves the size of their binary transfer to the browser.
+    + Discrete columns (strings and species lists) are joined into
+      strings and, if ``categorical``, dictionary-encoded as a
+      ``pd.Categorical``.
+    + Every numeric column is a contiguous array.
+
+    :param data_frame: An assembled data frame.
+    :param float32: Whether float columns may be stored as float32.
+    :param categorical: Whether discrete columns are made categorical.
+    :returns: A new data frame with the same index and columns.
+
+    """
+    columns = {}
+    for column in data_frame.columns:
+        series = data_frame[column]
+
+        if is_discrete(series):
+            values = discrete_values(series)
+            columns[column] = values.astype("category") if categorical \
+                else values
+            continue
+
+        values = np.ascontiguousarray(series.to_numpy())
+        if float32 and values.dtype == np.float64 and float32_safe(values):
+            values = values.astype(np.float32)
+        columns[column] = values
+
+    return pd.DataFrame(columns, index=data_frame.index,
+                        columns=data_frame.columns, copy=False)
+
+
+def aggregate_session_data(main_df: pd.DataFrame,
+                           metadata_df: MetadataTable,
+                           aggregation: Aggregation,
+                           y_columns: List[str]
+                           ) -> Tuple[pd.DataFrame, MetadataTable]:
+    """Summarize a data frame by binning one column.
+
+    Rows are grouped by the bin of ``aggregation.x_column`` and by the
+    value of ``aggregation.by``. Each summary row holds the bin center,
+    the group value and the mean of every other numeric column. Each of
+    the ``y_columns`` also gets ``"{y} count"``, ``"{y} std"``,
+    ``"{y} min"``, ``"{y} max"``, ``"{y} lower"`` and ``"{y} upper"``
+    columns, the last two being one standard deviation about the mean.
+
+    The metadata of a summary row is that of its values if they all
+    share the same metadata, and empty (-1) otherwise.
+
+    :param main_df: The data frame to be summarized.
+    :param metadata_df: The ``MetadataTable`` of ``main_df``.
+    :param aggregation: An ``Aggregation`` describing the grouping.
+    :param y_columns: The columns to compute summary statistics for.
+    :returns: The summary data frame and its ``MetadataTable``.
+
+    """
+    x_column, by, bins = aggregation
+    x_values = main_df[x_column].to_numpy(dtype=np.float64)
+
+    # Assign each row an equal width bin, rows without an x value are
+    # given a bin of -1 and are left out.
+    edges = np.linspace(np.nanmin(x_values), np.nanmax(x_values), bins + 1)
+    bin_index = np.clip(np.searchsorted(edges, x_values, side="right") - 1,
+                        0, bins - 1)
+    bin_index[np.isnan(x_values)] = -1
+    is_binned = bin_index >= 0
+
+    keys = [bin_index[is_binned]]
+    if by is not None:
+        keys.append(discrete_values(main_df[by]).to_numpy()[is_binned])
+
+    numeric_columns = [column for column in main_df.columns
+                       if column not in (x_column, by)
+                       and pd.api.types.is_numeric_dtype(main_df[column])]
+
+    grouped = main_df.loc[is_binned, numeric_columns].groupby(keys)
+    summary = grouped.mean()
+    for column in y_columns:
+        if column not in numeric_columns:
+            continue
+        statistics = grouped[column].agg(["count", "std", "min", "max"])
+        for statistic in statistics.columns:
+            summary[f"{column} {statistic}"] = statistics[statistic]
+        summary[f"{column} lower"] = summary[column] - statistics["std"]
+        summary[f"{column} upper"] = summary[column] + statistics["std"]
+
+    # Replace the group keys with the bin centers and group values.
+    centers = (edges[:-1] + edges[1:]) / 2
+    group_index = summary.index
+    summary = summary.reset_index(drop=True)
+    summary.insert(0, x_column, centers[
+        group_index.get_level_values(0).to_numpy()])
+    if by is not None:
+        summary.insert(1, by, group_index.get_level_values(1).to_numpy())
+
+    # Summary rows keep their metadata only if it is shared by every row.
+    grouped_codes = metadata_df.codes.loc[is_binned].groupby(keys)
+    codes = grouped_codes.first().where(grouped_codes.nunique() == 1, -1)
+    codes = codes.astype(np.int32).reset_index(drop=True)
+
+    logger.info(f"Aggregated {len(main_df)} rows into {len(summary)}.")
+    return summary, MetadataTable(codes=codes, keys=metadata_df.keys)
@@ -0,0 +1,181 @@
+"""Column profiles of prepared data frames.
+
+The display helpers choose controls, colour maps and size scales from a
+few statistics of each column. These are computed once per data frame and
+kept for as long as that frame exists, so that building controls and
+redrawing a figure does not read every value again.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports -- Standard Python modules
+# ----------------------------------------------------------------------------
+import logging
+import threading
+import weakref
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# ----------------------------------------------------------------------------
+# Imports -- Data science imports.
+# ----------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------------
+# Local package imports.
+# ----------------------------------------------------------------------------
+from .output import discrete_values, is_discrete
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# Global Definitions
+# ----------------------------------------------------------------------------
+PROFILE_QUANTILES = (0.0, 0.25, 0.5, 0.75, 1.0)
+"""The quantiles recorded for each continuous column."""
+
+FRAME_STORES = {}
+"""Values computed from data frames (such as their column profiles),
+keyed by the id of the frame. Entries are removed when their data frame
+is garbage collected."""
+
+_FRAME_STORES_LOCK = threading.Lock()
+
+
+class ColumnProfile(NamedTuple):
+    dtype_class: str
+    """Either "discrete" (strings and the like) or "continuous"."""
+    cardinality: int
+    """The number of distinct values."""
+    categories: Tuple
+    """The sorted distinct values of a discrete column, else empty."""
+    minimum: Optional[float]
+    """The minimum of a continuous column, else None."""
+    maximum: Optional[float]
+    """The maximum of a continuous column, else None."""
+    quantiles: Tuple[float, ...]
+    """The ``PROFILE_QUANTILES`` of a continuous column, else empty."""
+
+
+# ----------------------------------------------------------------------------
+# Profile Functions
+# ----------------------------------------------------------------------------
+def profile_series(series: pd.Series) -> ColumnProfile:
+    """Describe the values of a single column.
+
+    :param series: A data frame column.
+    :returns: A ``ColumnProfile``.
+
+    """
+    if is_discrete(series):
+        # Species lists are joined so that they can be counted.
+        values = discrete_values(series).dropna()
+        categories = tuple(sorted(values.unique(), key=str))
+        return ColumnProfile(dtype_class="discrete",
+                             cardinality=len(categories),
+                             categories=categories,
+                             minimum=None, maximum=None, quantiles=())
+
+    values = series.to_numpy(dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return ColumnProfile(dtype_class="continuous", cardinality=0,
+                             categories=(), minimum=None, maximum=None,
+                             quantiles=())
+
+    quantiles = tuple(float(value) for value in
+                      np.quantile(values, PROFILE_QUANTILES))
+    return ColumnProfile(dtype_class="continuous",
+                         cardinality=len(np.unique(values)),
+                         categories=(),
+                         minimum=quantiles[0],
+                         maximum=quantiles[-1],
+                         quantiles=quantiles)
+
+
+def combine_profiles(first: ColumnProfile,
+                     second: ColumnProfile) -> ColumnProfile:
+    """Describe the values of two parts of a column, such as the batches
+    of a streamed data frame, without reading them again.
+
+    Categories and ranges are combined exactly. Quantiles cannot be, so
+    a combined continuous profile has none, and its cardinality is the
+    larger of the two.
+
+    :param first: The profile of the first part of a column.
+    :param second: The profile of the second part of a column.
+    :returns: A ``ColumnProfile`` of both parts.
+
+    """
+    # A part without values (such as an all-missing column) adds nothing.
+    if second.cardinality == 0 or first == second:
+        return first
+    if first.cardinality == 0 or first.dtype_class != second.dtype_class:
+        return second if first.cardinality == 0 else first
+
+    if first.dtype_class == "discrete":
+        categories = tuple(sorted(set(first.categories)
+                                  | set(second.categories), key=str))
+        return first._replace(cardinality=len(categories),
+                              categories=categories)
+
+    return first._replace(
+        cardinality=max(first.cardinality, second.cardinality),
+        minimum=min(first.minimum, second.minimum),
+        maximum=max(first.maximum, second.maximum),
+        quantiles=())
+
+
+def forget_frame(key: int):
+    """Create the weak reference callback that removes a frame store."""
+    def callback(reference):
+        with _FRAME_STORES_LOCK:
+            if FRAME_STORES.get(key, (None, None))[0] is reference:
+                del FRAME_STORES[key]
+    return callback
+
+
+def frame_store(data_frame: pd.DataFrame) -> Dict:
+    """Get a dictionary of values kept for as long as a data frame exists.
+
+    :param data_frame: A prepared data frame.
+    :returns: The dictionary of the data frame, empty when first created.
+
+    """
+    key = id(data_frame)
+    with _FRAME_STORES_LOCK:
+        reference, store = FRAME_STORES.get(key, (None, None))
+        # An id may be re-used once its frame has been collected.
+        if reference is None or reference() is not data_frame:
+            store = {}
+            reference = weakref.ref(data_frame, forget_frame(key))
+            FRAME_STORES[key] = (reference, store)
+    return store
+
+
+def column_profile(data_frame: pd.DataFrame,
+                   columns: List[str] = None) -> Dict[str, ColumnProfile]:
+    """Get the profiles of the columns of a data frame.
+
+    Profiles are computed the first time a column is requested, and kept
+    with the data frame. Columns added to the frame later (such as
+    derived columns) are profiled when they are first requested.
+
+    :param data_frame: A prepared data frame. Columns may be added to it,
+        but existing columns should not be modified in place.
+    :param columns: The columns to be profiled. Defaults to every column.
+    :returns: A dictionary of ``{column_name: ColumnProfile}``.
+
+    """
+    if columns is None:
+        columns = list(data_frame.columns)
+
+    profiles = frame_store(data_frame).setdefault("profiles", {})
+
+    missing = [column for column in columns if column not in profiles]
+    for column in missing:
+        profiles[column] = profile_series(data_frame[column])
+    if missing:
+        logger.debug(f"Columns profiled: {missing}")
+
+    return {column: profiles[column] for column in columns}
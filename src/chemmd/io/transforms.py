@@ -1,48 +1,167 @@
 """Transforms for data.
 
+Transforms are applied to whole columns after the query groups have been
+resolved. Each transform is registered against a tuple of factor
+patterns, and is applied to any matched factor whose label matches one of
+those patterns (see ``Factor.query``).
+
 """
 
 # ----------------------------------------------------------------------------
 # Imports -- Standard Python modules
 # ----------------------------------------------------------------------------
+import collections
 import logging
+import threading
+from typing import Callable, Dict, NamedTuple, Tuple
+
+# ----------------------------------------------------------------------------
+# Imports -- Data science imports.
+# ----------------------------------------------------------------------------
+import numpy as np
+
+# ----------------------------------------------------------------------------
+# Local package imports.
+# ----------------------------------------------------------------------------
+from ..models import ScalarColumn
+from .fingerprints import datafile_fingerprint
 
 logger = logging.getLogger(__name__)
 
 
+class Transform(NamedTuple):
+    function: Callable
+    """The function applied to a column, called as
+    ``function(array, *arguments)``."""
+    arguments: Callable
+    """A function that returns a tuple of the (hashable) arguments for
+    ``function`` from a grouping dictionary."""
+
+
 # ----------------------------------------------------------------------------
 # Transform Functions
 # ----------------------------------------------------------------------------
-def apply_stoichiometry_coefficient(data, species):
-    stoichiometry = species.stoichiometry
+def apply_stoichiometry_coefficient(data: np.ndarray,
+                                    stoichiometry: float) -> np.ndarray:
     return data * stoichiometry
 
 
+def stoichiometry_arguments(grouping_dict: dict) -> Tuple[float]:
+    """Get the stoichiometry of the first species matched by a group.
+
+    Species without a stoichiometry are given a coefficient of one.
+
+    """
+    species_map = grouping_dict.get("species_map") or {}
+    species_keys = grouping_dict.get("species_keys") or []
+    for species in species_keys:
+        if species_map.get(species) is not None:
+            return (species_map[species], )
+    return (1.0, )
+
+
 # ----------------------------------------------------------------------------
 # Global Definitions
 # ----------------------------------------------------------------------------
 INDEPENDENT_TRANSFORMS = {
-    ("Molar", ): apply_stoichiometry_coefficient,
+    ("Molar", ): Transform(apply_stoichiometry_coefficient,
+                           stoichiometry_arguments),
 }
 
+TRANSFORM_CACHE_SIZE = 256
+"""The number of transformed datafile columns kept by
+``TRANSFORM_CACHE``."""
+
+TRANSFORM_CACHE = collections.OrderedDict()
+"""Transformed datafile columns, keyed by the fingerprint of the
+datafile, column index, transform and arguments."""
+
+_TRANSFORM_CACHE_LOCK = threading.Lock()
+
 
-def apply_transform(group_dict):
-    """Apply a transform to a grouping dictionary.
+def transform_column(grouping_dict: dict, transform: Transform):
+    """Apply a transform to the factor data of a grouping dictionary.
+
+    Datafile columns are transformed as a single array operation, and the
+    result is cached. Constant columns only have their value transformed.
+
+    :param grouping_dict: A matched grouping dictionary, see
+        ``chemmd.io.create_group_mapping``.
+    :param transform: The transform to apply.
+    :returns: The transformed factor data, as an array or ``ScalarColumn``.
+
+    """
+    data = grouping_dict["factor_data"]
+    arguments = transform.arguments(grouping_dict)
+
+    if isinstance(data, ScalarColumn):
+        if isinstance(data.value, bool) \
+                or not isinstance(data.value, (int, float)):
+            return data
+        value = transform.function(np.float64(data.value), *arguments)
+        return ScalarColumn(float(value), data.size)
+
+    factor = grouping_dict["factor"]
+    experiment = grouping_dict.get("experiment")
+    datafile = getattr(experiment, "datafile", None)
+    key = None
+    if datafile is not None:
+        try:
+            # The datafile is named by its contents, so a changed file
+            # is transformed again.
+            key = (datafile_fingerprint(datafile), factor.csv_column_index,
+                   transform.function.__qualname__, arguments)
+        except OSError:
+            logger.debug(f"Datafile {datafile} could not be fingerprinted.")
+
+    if key is not None:
+        with _TRANSFORM_CACHE_LOCK:
+            if key in TRANSFORM_CACHE:
+                TRANSFORM_CACHE.move_to_end(key)
+                return TRANSFORM_CACHE[key]
+
+    result = transform.function(np.asarray(data, dtype=np.float64),
+                                *arguments)
+    # The cached array is shared, so it should not be modified.
+    result.setflags(write=False)
+
+    if key is not None:
+        with _TRANSFORM_CACHE_LOCK:
+            TRANSFORM_CACHE[key] = result
+            if len(TRANSFORM_CACHE) > TRANSFORM_CACHE_SIZE:
+                TRANSFORM_CACHE.popitem(last=False)
+
+    return result
+
+
+def apply_transforms(group_mapping: Dict,
+                     transforms: Dict = None) -> Dict:
+    """Apply the registered transforms to a group mapping.
+
+    :param group_mapping: A dictionary from ``create_group_mapping``.
+    :param transforms: A dictionary of ``{factor_patterns: Transform}``.
+        Defaults to ``INDEPENDENT_TRANSFORMS``.
+    :returns: A new group mapping with transformed factor data. The
+        given mapping is not modified.
 
-    :param group_dict:
-    :return:
     """
-    for group, metadata_dict in group_dict.items():
-        g_label, g_unit_filter, g_species_filter = group
-
-        for key, func in INDEPENDENT_TRANSFORMS.items():
-            if any(unit in key for unit in g_unit_filter):
-                logger.info(f"Transform {func} called for {key}.")
-                data = func(metadata_dict.get("factor_data"),
-                            metadata_dict.get("species"))
-                metadata_dict["factor_data"] = data
-                # return metadata_dict
-            # else:
-            #     return metadata_dict
-    return group_dict
+    if transforms is None:
+        transforms = INDEPENDENT_TRANSFORMS
+
+    transformed_mapping = {}
+    for group, grouping_dict in group_mapping.items():
+        factor = grouping_dict.get("factor")
+
+        # Species columns have no factor data to transform.
+        if factor is not None:
+            for patterns, transform in transforms.items():
+                if factor.query(patterns):
+                    logger.info(f"Transform {transform.function.__name__} "
+                                f"called for {group.column_name}.")
+                    grouping_dict = {**grouping_dict,
+                                     "factor_data": transform_column(
+                                         grouping_dict, transform)}
+
+        transformed_mapping[group] = grouping_dict
 
+    return transformed_mapping
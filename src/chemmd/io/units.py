@@ -0,0 +1,174 @@
+"""Unit normalization for factor data.
+
+Factors may be recorded in any of several equivalent units (eg. mM rather
+than Molar). When a query group asks for a unit, factors recorded in a
+convertible unit are also matched, and their data is converted to the
+requested unit as the columns are built.
+
+Each unit is described by its dimension and the scale and offset that
+convert it to the base unit of that dimension::
+
+    base_value = value * scale + offset
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports -- Standard Python modules
+# ----------------------------------------------------------------------------
+import dataclasses
+import functools
+import logging
+import re
+from typing import Dict, Optional, Tuple
+
+# ----------------------------------------------------------------------------
+# Imports -- Data science imports.
+# ----------------------------------------------------------------------------
+import numpy as np
+
+# ----------------------------------------------------------------------------
+# Local package imports.
+# ----------------------------------------------------------------------------
+from ..models import Factor, ScalarColumn
+from ..models import util
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# Global Definitions
+# ----------------------------------------------------------------------------
+UNIT_CONVERSIONS = {
+    # Molar concentration, base unit Molar (mol/L).
+    "Molar": ("concentration", 1.0, 0.0),
+    "M": ("concentration", 1.0, 0.0),
+    "mol/L": ("concentration", 1.0, 0.0),
+    "mM": ("concentration", 1e-3, 0.0),
+    "mmol/L": ("concentration", 1e-3, 0.0),
+    "uM": ("concentration", 1e-6, 0.0),
+    "µM": ("concentration", 1e-6, 0.0),
+    # Molal concentration, base unit Molal (mol/kg). This cannot be
+    # converted to a Molar concentration without the solution density.
+    "Molal": ("molality", 1.0, 0.0),
+    "mol/kg": ("molality", 1.0, 0.0),
+    "mmol/kg": ("molality", 1e-3, 0.0),
+    # Temperature, base unit Kelvin.
+    "Kelvin": ("temperature", 1.0, 0.0),
+    "Celsius": ("temperature", 1.0, 273.15),
+    "°C": ("temperature", 1.0, 273.15),
+    "Fahrenheit": ("temperature", 5.0 / 9.0, 273.15 - 32.0 * 5.0 / 9.0),
+    "°F": ("temperature", 5.0 / 9.0, 273.15 - 32.0 * 5.0 / 9.0),
+}
+"""A dictionary of ``{unit: (dimension, scale, offset)}``."""
+
+
+# ----------------------------------------------------------------------------
+# Conversion Functions
+# ----------------------------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def conversion(unit: str, target: str) -> Optional[Tuple[float, float]]:
+    """Get the scale and offset that convert values of one unit to
+    another.
+
+    :param unit: The unit of the values.
+    :param target: The unit the values should be converted to.
+    :returns: A ``(scale, offset)`` tuple such that
+        ``value * scale + offset`` is in the ``target`` unit, or None
+        if the units are unknown or of different dimensions.
+
+    """
+    try:
+        dimension, unit_scale, unit_offset = UNIT_CONVERSIONS[unit]
+        target_dimension, target_scale, target_offset = \
+            UNIT_CONVERSIONS[target]
+    except KeyError:
+        return None
+
+    if dimension != target_dimension:
+        return None
+
+    return (unit_scale / target_scale,
+            (unit_offset - target_offset) / target_scale)
+
+
+def conversion_target(factor: Factor, factor_filters) -> Optional[str]:
+    """Find the unit a factor should be converted to for a group.
+
+    A factor already in one of the filtered units is not converted.
+    Filter terms that are not units (such as a factor type or reference
+    value) must each match one of the other properties of the factor,
+    as a shared unit alone does not make an unrelated factor a match.
+
+    :param factor: A ``Factor`` instance.
+    :param factor_filters: The factor filters of a query group.
+    :returns: The first filter that names a unit the factor can be
+        converted to, or None.
+
+    """
+    terms = util.ensure_list(factor_filters)
+    if factor.unit_reference is None \
+            or any(re.match(term, str(factor.unit_reference))
+                   for term in terms):
+        return None
+
+    properties = [factor.factor_type, factor.reference_value,
+                  factor.string_value]
+    if not all(any(re.match(term, str(prop)) for prop in properties)
+               for term in terms if term not in UNIT_CONVERSIONS):
+        return None
+
+    for term in terms:
+        if conversion(factor.unit_reference, term) is not None:
+            return term
+
+    return None
+
+
+def convert_values(values, scale: float, offset: float):
+    """Convert a column of values with a scale and offset.
+
+    :param values: A list or array of values, or a ``ScalarColumn``.
+    :returns: The converted values as an array or ``ScalarColumn``.
+
+    """
+    if isinstance(values, ScalarColumn):
+        return ScalarColumn(values.value * scale + offset, values.size)
+    return np.asarray(values, dtype=np.float64) * scale + offset
+
+
+def normalize_units(group_mapping: Dict) -> Dict:
+    """Convert matched factors to the units requested by their groups.
+
+    :param group_mapping: A dictionary from ``create_group_mapping``.
+    :returns: A new group mapping in which converted factors are replaced
+        by a copy in the target unit, and their data converted. The given
+        mapping is not modified.
+
+    """
+    normalized_mapping = {}
+    for group, grouping_dict in group_mapping.items():
+        factor = grouping_dict.get("factor")
+
+        # Species columns have no factor data to convert.
+        target = None
+        if factor is not None:
+            target = conversion_target(factor, group.factor_filters)
+
+        if target is not None:
+            scale, offset = conversion(factor.unit_reference, target)
+            logger.debug(f"Converting {group.column_name} from "
+                         f"{factor.unit_reference} to {target}.")
+
+            decimal_value = factor.decimal_value
+            if decimal_value is not None:
+                decimal_value = decimal_value * scale + offset
+
+            grouping_dict = {
+                **grouping_dict,
+                "factor": dataclasses.replace(factor, unit_reference=target,
+                                              decimal_value=decimal_value),
+                "factor_data": convert_values(grouping_dict["factor_data"],
+                                              scale, offset)}
+
+        normalized_mapping[group] = grouping_dict
+
+    return normalized_mapping
@@ -23,7 +23,8 @@ from typing import Union
 # Local package imports.
 # ----------------------------------------------------------------------------
 from .nodal import Node, Experiment, Sample, Source
-from .core import Factor, SpeciesFactor, Comment, QueryGroup, DerivedGroup
+from .core import (Factor, SpeciesFactor, Comment, QueryGroup, DerivedGroup,
+                   ScalarColumn)
 
 
 # ----------------------------------------------------------------------------
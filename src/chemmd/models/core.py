@@ -10,11 +10,17 @@ in the nodal mapping functions.
 # ----------------------------------------------------------------------------
 # Imports -- Standard Python modules
 # ----------------------------------------------------------------------------
+import itertools
 import re  # Regular expression functions.
 from textwrap import dedent  # Prevent indents from percolating to the user.
-from typing import Tuple, Union, Callable, NamedTuple  # For declaring types.
+from typing import Tuple, Union, Callable, NamedTuple, Any  # For declaring types.
 from dataclasses import dataclass
 
+# ----------------------------------------------------------------------------
+# Imports -- Data science imports.
+# ----------------------------------------------------------------------------
+import numpy as np
+
 # ----------------------------------------------------------------------------
 # Local package imports.
 # ----------------------------------------------------------------------------
@@ -178,7 +184,7 @@ class Comment:
     def as_markdown(self):
         """Formats the contents of this comment as Markdown."""
         return dedent(f"""\
-            **{self.name}**: {self.body}\n
+            **{self.comment_title}**: {self.comment_body}\n
         """)
 
 
@@ -192,6 +198,44 @@ class DataFile:
     filename: str
 
 
+@dataclass(frozen=True)
+class ScalarColumn:
+    """A single value repeated over a column of a given length.
+
+    Factors which describe a whole datafile (eg. experimental temperature)
+    are carried as one of these rather than as a full list of repeated
+    values. The column is only built when ``as_array`` is called.
+
+    """
+    value: Any
+    """The value shared by every row of this column."""
+    size: int
+    """The number of rows this column describes."""
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return itertools.repeat(self.value, self.size)
+
+    def resized(self, size: int) -> "ScalarColumn":
+        """Return a copy of this column with a new length."""
+        return ScalarColumn(self.value, size)
+
+    def as_array(self) -> np.ndarray:
+        """Build the column as a NumPy array.
+
+        Numeric values are given a numeric array, all other values
+        (strings, lists and tuples) are placed in an object array.
+
+        """
+        if isinstance(self.value, (int, float)):
+            return np.full(self.size, self.value)
+        array = np.empty(self.size, dtype=object)
+        array.fill(self.value)
+        return array
+
+
 class QueryGroup(NamedTuple):
     column_name: str
     """The user-given name of the column this group will create."""
@@ -207,6 +251,7 @@ class DerivedGroup(NamedTuple):
     source_names: Tuple[str, ...]
     """The existing columns that make up the values used by
     ``callable_``."""
-    callable_: Callable
+    callable_: Union[Callable, str]
     """The function to be applied to those values pulled from
-    ``source_names``."""
+    ``source_names``, or an arithmetic expression string over those
+    columns (see ``chemmd.io.expressions``)."""
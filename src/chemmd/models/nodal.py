@@ -8,18 +8,20 @@ of the two.
 # ----------------------------------------------------------------------------
 # Imports -- Standard Python modules
 # ----------------------------------------------------------------------------
+import itertools
 import logging
 import uuid
+from collections import ChainMap
 
 from textwrap import dedent  # Prevent indents from percolating to the user.
-from typing import List, Dict
+from typing import List, Dict, Union
 from dataclasses import dataclass
 
 # ----------------------------------------------------------------------------
 # Local package imports.
 # ----------------------------------------------------------------------------
 from . import util
-from .core import Factor, Comment, SpeciesFactor
+from .core import Factor, Comment, SpeciesFactor, ScalarColumn
 
 logger = logging.getLogger(__name__)
 
@@ -125,13 +127,8 @@ class Source:
 
     @property
     def as_markdown(self):
-        text = ""
-        for factor in self.all_factors:
-            text += factor.as_markdown
-
-        for species in self.all_species:
-            text += species.as_markdown
-        return text
+        return "".join(item.as_markdown for item in itertools.chain(
+            self.all_factors, self.all_species))
 
 
 @dataclass
@@ -232,17 +229,10 @@ class Sample:
 
     @property
     def as_markdown(self):
-        text = f"#### {self.sample_name}\n"
-        for source in self.all_sources:
-            text += source.as_markdown
-
-        for factor in self.all_factors:
-            text += factor.as_markdown
-
-        for species in self.all_species:
-            text += species.as_markdown
-
-        return text
+        parts = [f"#### {self.sample_name}\n"]
+        parts.extend(item.as_markdown for item in itertools.chain(
+            self.all_sources, self.all_factors, self.all_species))
+        return "".join(parts)
 
 
 @dataclass
@@ -285,7 +275,8 @@ class Experiment:
         """
         return str(uuid.uuid3(uuid.NAMESPACE_DNS, str(self)))
 
-    def parse_factor_value(self, factor: Factor) -> List:
+    def parse_factor_value(self, factor: Factor
+                           ) -> Union[List, ScalarColumn]:
         """Parses a factor value.
 
         Args:
@@ -293,7 +284,8 @@ class Experiment:
             be parsed.
 
         Returns:
-            A sized list of that factors value.
+            The datafile column of that factor, or a ``ScalarColumn`` of
+            that factors value sized to the datafile.
 
         """
         csv_data_dict = util.load_csv_as_dict(self.datafile)
@@ -303,30 +295,32 @@ class Experiment:
             data = csv_data_dict[str(factor.csv_column_index)]
             return data
         elif factor.value:
-            return [factor.value, ] * factor_size
+            return ScalarColumn(factor.value, factor_size)
 
     # -------------------------------------------------------------------------
     # ChainMap creation functions.
     # -------------------------------------------------------------------------
-    def species_factor_mapping(self, parent_node) -> Dict:
+    def species_factor_mapping(self, parent_node) -> ChainMap:
         """Create a species - factor label mapping of this Experiment object.
 
-        This function creates a dictionary of ``{(species_keys, factor_keys):
-        factors}`` for each factor associated with this object. The order
-        of examination is setup so that lower priority factors will be
-        overwritten by higher priority factors.
+        This function creates a mapping of ``{(species_keys, factor_keys):
+        factors}`` for each factor associated with this object. Each source
+        and sample contributes one layer to a ``ChainMap``, ordered so that
+        lookups resolve to the highest priority factor without copying the
+        accumulated layers.
 
         Args:
             parent_node (Node): The parent ``chemmd.models.Node`` object.
 
-        Returns (dict):
-            A dictionary mapping of species and factor keys to their
+        Returns (ChainMap):
+            A layered mapping of species and factor keys to their
             matching factors.
 
         """
-        # Create dictionaries to be output.
-        source_mapping = {}
-        sample_mapping = {}
+        # Layers are listed in priority order, the first layer that
+        # contains a key supplies its value.
+        source_layers = []
+        sample_layers = []
 
         # Oder the samples and factors of this experiment.
         # Parental factors (those with a higher priority) are added at the
@@ -351,10 +345,9 @@ class Experiment:
                     source_map["experiment"] = self
                     source_map["parent_node"] = parent_node
 
-                # Update the output mapping dictionary, Call the
-                # original dictionary first so that the new values
-                # overwrite the old.
-                source_mapping = {**source_maps, **source_mapping}
+                # Earlier sources take priority over later ones, so each
+                # new layer is placed behind those already collected.
+                source_layers.append(source_maps)
 
             # Create the basic sample mapping and update it with
             # associated metadata objects.
@@ -365,30 +358,20 @@ class Experiment:
                 sample_map["experiment"] = self
                 sample_map["parent_node"] = parent_node
 
-            # Update the output mapping. Call the original mapping
-            # first so that new values overwrite the old values.
-            sample_mapping = {**sample_maps, **sample_mapping}
+            sample_layers.append(sample_maps)
 
-        # Combine the source and sample mappings. Samples have a higher
-        # priority, so they are called last so that those values
-        # overwrite any matching keys in the source mapping.
-        mapping = {**source_mapping, **sample_mapping}
+        # Samples have a higher priority than sources, so their layers
+        # are searched first.
+        mapping = ChainMap(*sample_layers, *source_layers)
         return mapping
 
     @property
     def as_markdown(self):
         """Creates a markdown representation of this object."""
-        text = f"### {self.name}\n"
-        for sample in self.samples:
-            text += sample.as_markdown
-
-        for factor in self.factors:
-            text += factor.as_markdown
-
-        for comment in self.comments:
-            text += comment.as_markdown
-
-        return text
+        parts = [f"### {self.name}\n"]
+        parts.extend(item.as_markdown for item in itertools.chain(
+            self.samples, self.factors, self.comments))
+        return "".join(parts)
 
 
 @dataclass
@@ -412,12 +395,13 @@ class Node:
 
     @property
     def as_markdown(self):
-        text = ""
+        # The parts are joined once, rather than concatenated in turn.
+        parts = []
 
         if self.node_information:
             # Create an alias for the information dictionary.
             i = self.node_information
-            text = dedent(f"""\
+            parts.append(dedent(f"""\
             # {i.get("node_title")}
 
             **Description**: {i.get("node_description")}\n
@@ -425,26 +409,22 @@ class Node:
             **Public Release Date**: *{i.get("public_release_date")}*\n
 
             ---
-            """)
+            """))
 
         if self.experiments:
-            text += dedent("""## Assays\n""")
-            for assay in self.experiments:
-                text += assay.as_markdown
+            parts.append(dedent("""## Assays\n"""))
+            parts.extend(assay.as_markdown for assay in self.experiments)
 
         if self.samples:
-            text += dedent("""## Samples\n""")
-            for sample in self.samples:
-                text += sample.as_markdown
+            parts.append(dedent("""## Samples\n"""))
+            parts.extend(sample.as_markdown for sample in self.samples)
 
         if self.factors:
-            text += dedent("""### Factors\n""")
-            for factor in self.factors:
-                text += factor.as_markdown
+            parts.append(dedent("""### Factors\n"""))
+            parts.extend(factor.as_markdown for factor in self.factors)
 
         if self.comments:
-            text += dedent("""### Comments\n""")
-            for comment in self.comments:
-                text += comment.as_markdown
+            parts.append(dedent("""### Comments\n"""))
+            parts.extend(comment.as_markdown for comment in self.comments)
 
-        return text
+        return "".join(parts)
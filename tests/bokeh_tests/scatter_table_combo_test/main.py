@@ -14,6 +14,7 @@ import bokeh.models
 # ----------------------------------------------------------------------------
 import chemmd.io.output
 from chemmd.demos import loaders
+from chemmd.display import helpers
 from chemmd.display.views.generic_table import table_layout
 from chemmd.display.views.generic_cross_filter_scatter import scatter_layout
 
@@ -30,6 +31,9 @@ main_df, metadata_df, metadata_dict = chemmd.io.output.prepare_nodes_for_bokeh(
     loaders.NMR_GROUPS["y_groups"],
     nmr_nodes)
 
+# Both tabs share a single data source.
+source = bk.models.ColumnDataSource(data=helpers.column_data(main_df, []))
+
 # ----------------------------------------------------------------------------
 # Table creation
 # ----------------------------------------------------------------------------
@@ -38,7 +42,8 @@ table = table_layout(
     loaders.NMR_GROUPS["y_groups"],
     main_df,
     metadata_df,
-    metadata_dict)
+    metadata_dict,
+    source=source)
 
 table_panel = bk.models.Panel(child=table, title="Data Table")
 
@@ -51,7 +56,8 @@ scatter = scatter_layout(
     loaders.NMR_GROUPS["y_groups"],
     main_df,
     metadata_df,
-    metadata_dict)
+    metadata_dict,
+    source=source)
 
 scatter_panel = bk.models.Panel(child=scatter, title="Scatter")
 
@@ -24,10 +24,12 @@ from chemmd.display.views.generic_cross_filter_scatter import scatter_layout
 # Load the demo data from ChemMD.
 nmr_nodes = [loaders.node_demo_by_key("SIPOS_NMR"), ]
 
-main_df, metadata_df, metadata_dict = chemmd.io.prepare_nodes_for_bokeh(
+# Stream the data so that the first experiment is displayed immediately.
+batches = chemmd.io.stream_nodes_for_bokeh(
     loaders.NMR_GROUPS["x_groups"],
     loaders.NMR_GROUPS["y_groups"],
     nmr_nodes)
+main_df, metadata_df, metadata_dict = next(batches)
 
 
 # ----------------------------------------------------------------------------
@@ -38,7 +40,8 @@ scatter = scatter_layout(
     loaders.NMR_GROUPS["y_groups"],
     main_df,
     metadata_df,
-    metadata_dict)
+    metadata_dict,
+    batches=batches)
 
 scatter_panel = bk.models.Panel(child=scatter, title="Scatter")
 
@@ -0,0 +1,361 @@
+"""Test the display helper functions.
+
+"""
+
+# ----------------------------------------------------------------------------
+# Imports for Testing
+# ----------------------------------------------------------------------------
+import ast
+import gc
+import io
+import weakref
+
+import bokeh.document
+import bokeh.models
+import numpy as np
+import pandas as pd
+import pytest
+
+import chemmd.io
+from chemmd.display import decimation, density, export, helpers
+from chemmd.models import DerivedGroup
+
+
+# ----------------------------------------------------------------------------
+# Fixtures
+# ----------------------------------------------------------------------------
+@pytest.fixture
+def concentration_df():
+    return pd.DataFrame({"Al Concentration": [1.0, 2.0, 4.0],
+                         "Base Concentration": [2.0, 2.0, 8.0]})
+
+
+# ----------------------------------------------------------------------------
+# Derived Column Tests
+# ----------------------------------------------------------------------------
+def test_create_derived_column(concentration_df):
+    group = DerivedGroup("Ratio", ("Al Concentration", "Base Concentration"),
+                         lambda al, base: al / base)
+    data_frame = helpers.create_derived_column(concentration_df, group)
+    assert data_frame["Ratio"].tolist() == [0.5, 1.0, 0.5]
+
+
+def test_create_expression_column(concentration_df):
+    group = chemmd.io.expression_group(
+        "Ratio", "log10(`Al Concentration` / `Base Concentration` * 100)")
+    assert group.source_names == ("Al Concentration", "Base Concentration")
+
+    data_frame = helpers.create_derived_column(concentration_df, group)
+    assert np.allclose(data_frame["Ratio"], [np.log10(50), 2, np.log10(50)])
+
+    # The same expression over the same columns is read from the cache.
+    result = chemmd.io.evaluate_expression(group.callable_, data_frame)
+    assert chemmd.io.evaluate_expression(group.callable_,
+                                         data_frame) is result
+
+
+def test_expression_results_kept_with_frame(concentration_df):
+    expression = "`Al Concentration` * 2"
+    result = chemmd.io.evaluate_expression(expression, concentration_df)
+    store = chemmd.io.profiles.frame_store(concentration_df)
+    assert any(key[0] == expression for key in store["expressions"])
+
+    # A copy of the frame does not share the results of the original.
+    copied = concentration_df.copy()
+    assert chemmd.io.evaluate_expression(expression, copied) is not result
+
+
+def test_constant_power_expression(concentration_df):
+    with np.errstate(over="ignore"):
+        result = chemmd.io.evaluate_expression("2**2**2**2**2**2",
+                                               concentration_df)
+    assert result.shape == (3, )
+    assert np.isinf(result).all()
+
+
+def test_legacy_number_nodes(monkeypatch, concentration_df):
+    # Python 3.6 and 3.7 parse numbers as ``ast.Num`` nodes with an ``n``.
+    class Num(ast.AST):
+        _fields = ("n", )
+
+    class LegacyNumbers(ast.NodeTransformer):
+        def visit_Constant(self, node):
+            return Num(n=node.value)
+
+    parse = ast.parse
+    monkeypatch.setattr(chemmd.io.expressions, "NUMBER_NODES", (Num, ))
+    monkeypatch.setattr(chemmd.io.expressions.ast, "parse",
+                        lambda *args, **kwargs: LegacyNumbers().visit(
+                            parse(*args, **kwargs)))
+
+    compiled = chemmd.io.expressions.compile_expression.__wrapped__(
+        "log10(`Al Concentration` / `Base Concentration` * 100)")
+    arrays = {name: concentration_df[name].to_numpy()
+              for name in compiled.columns}
+    assert np.allclose(compiled.evaluator(arrays),
+                       [np.log10(50), 2, np.log10(50)])
+
+
+@pytest.mark.parametrize("expression", ["__import__('os')",
+                                        "`Al Concentration`.sum()",
+                                        "open('file')"])
+def test_unsafe_expressions(expression):
+    with pytest.raises(ValueError):
+        chemmd.io.expressions.compile_expression(expression)
+
+
+# ----------------------------------------------------------------------------
+# Decimation Tests
+# ----------------------------------------------------------------------------
+@pytest.fixture
+def spectrum_df():
+    x = np.linspace(0.0, 10.0, 1000)
+    y = np.sin(x)
+    y[500] = 10.0  # A single sharp peak.
+    return pd.DataFrame({"Shift": x, "Intensity": y,
+                         "Sample": ["a", "b"] * 500})
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_decimate_keeps_extremes(spectrum_df, method):
+    x = spectrum_df["Shift"].to_numpy()
+    y = spectrum_df["Intensity"].to_numpy()
+    selected = decimation.decimate(x, y, 50, method=method)
+    assert len(selected) <= 50
+    assert np.all(np.diff(selected) > 0)
+    assert 500 in selected
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("budget", [0, 1, 2, 3])
+def test_decimate_small_budgets(spectrum_df, method, budget):
+    selected = decimation.decimate(spectrum_df["Shift"].to_numpy(),
+                                   spectrum_df["Intensity"].to_numpy(),
+                                   budget, method=method)
+    assert min(budget, 2) <= len(selected) <= budget
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_lttb_keeps_endpoints(spectrum_df):
+    selected = decimation.lttb(spectrum_df["Shift"].to_numpy(),
+                               spectrum_df["Intensity"].to_numpy(), 20)
+    assert len(selected) == 20
+    assert selected[0] == 0 and selected[-1] == 999
+
+
+def test_decimate_frame_range_and_series(spectrum_df):
+    positions = decimation.decimate_frame(
+        spectrum_df, "Shift", "Intensity", 40, x_range=(2.0, 4.0),
+        by="Sample")
+    selected = spectrum_df.iloc[positions]
+    assert selected["Shift"].between(2.0, 4.0).all()
+    assert set(selected["Sample"]) == {"a", "b"}
+    assert (selected["Sample"].value_counts() <= 20).all()
+
+
+def test_decimate_frame_many_series(spectrum_df):
+    data_frame = spectrum_df.assign(Sample=np.arange(1000) % 30)
+    positions = decimation.decimate_frame(data_frame, "Shift", "Intensity",
+                                          10, by="Sample")
+    assert len(positions) == 10
+    assert data_frame["Sample"].iloc[positions].nunique() == 10
+
+
+# ----------------------------------------------------------------------------
+# Density Tests
+# ----------------------------------------------------------------------------
+def test_bin_density(spectrum_df):
+    grid = density.bin_density(spectrum_df, "Shift", "Intensity", bins=20)
+    assert grid.counts.shape == (1, 20, 20)
+    assert grid.total.sum() == len(spectrum_df)
+    assert grid.x_range == (0.0, 10.0)
+
+    visible = density.bin_density(spectrum_df, "Shift", "Intensity",
+                                  bins=20, x_range=(2.0, 4.0))
+    assert visible.total.sum() == spectrum_df["Shift"].between(2.0, 4.0).sum()
+
+
+def test_bin_density_by_category(spectrum_df):
+    grid = density.bin_density(spectrum_df, "Shift", "Intensity", bins=10,
+                               by="Sample")
+    assert grid.categories == ["a", "b"]
+    assert grid.counts.shape == (2, 10, 10)
+    assert list(grid.counts.sum(axis=(1, 2))) == [500, 500]
+
+    image = density.shade_categories(grid, ["#ff0000", "#0000ff"])
+    rgba = image.view(np.uint8).reshape(image.shape + (4, ))
+    assert image.shape == (10, 10)
+    assert np.all((rgba[..., 3] == 0) == (grid.total == 0))
+
+
+# ----------------------------------------------------------------------------
+# Metadata Rendering Tests
+# ----------------------------------------------------------------------------
+def test_metadata_selection_html(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    main_df, metadata_df, metadata_dict = chemmd.io.prepare_nodes_for_bokeh(
+        x_groups, y_groups, [sipos_drupal_node])
+
+    assert "No data point selected" in helpers.metadata_selection_html(
+        metadata_df, metadata_dict)
+
+    single = helpers.metadata_selection_html(metadata_df, metadata_dict, [0])
+    repeated = helpers.metadata_selection_html(metadata_df, metadata_dict,
+                                               [0] * 100)
+    assert single == repeated
+    assert all(key in helpers.METADATA_HTML_CACHE
+               for keys in metadata_df.resolve([0])[0] for key in keys
+               if key in metadata_dict)
+
+
+def test_prerender_metadata(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    _, metadata_df, metadata_dict = chemmd.io.prepare_nodes_for_bokeh(
+        x_groups, y_groups, [sipos_drupal_node])
+    document = bokeh.document.Document()
+
+    store = helpers.prerender_metadata(metadata_dict, document)
+    assert helpers.METADATA_STORES[document] is store
+    assert len(store) == len(metadata_dict)
+    for key, item in metadata_dict.items():
+        assert store.html(key, item) == helpers.render_metadata_html(key, item)
+
+
+def test_selection_statistics(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    main_df, metadata_df, metadata_dict = chemmd.io.prepare_nodes_for_bokeh(
+        x_groups, y_groups, [sipos_drupal_node])
+    selected = list(range(0, len(main_df), 2))
+
+    summary = helpers.selection_statistics(main_df, metadata_df, selected)
+    column = "Total Aluminate Concentration"
+    assert summary.count == len(selected)
+    assert np.isclose(summary.numeric.loc[column, "mean"],
+                      main_df[column].iloc[selected].mean())
+    assert summary.discrete["Counter Ion"].sum() == len(selected)
+    assert summary.experiments.sum() <= len(selected)
+    assert "points selected" in helpers.selection_summary_html(
+        summary, metadata_dict)
+
+
+def test_stream_batches(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    batches = chemmd.io.stream_nodes_for_bokeh(x_groups, y_groups,
+                                               [sipos_drupal_node])
+    main_df, metadata_df, metadata_dict = next(batches)
+    source = bokeh.models.ColumnDataSource(main_df)
+    document = bokeh.document.Document()
+    streamed = [main_df]
+
+    helpers.stream_batches(source, metadata_df, metadata_dict, batches,
+                           document, on_batch=streamed.append)
+    # Each batch is streamed on the next tick of the document.
+    while document.session_callbacks:
+        for callback in list(document.session_callbacks):
+            document.remove_next_tick_callback(callback)
+            callback.callback()
+
+    streamed_df = pd.concat(streamed)
+    assert len(streamed) > 1
+    assert len(streamed_df) == len(source.data["index"]) == len(metadata_df)
+    assert streamed_df.index.tolist() == list(source.data["index"])
+
+
+def test_sorted_columns(spectrum_df):
+    index = helpers.sorted_columns(spectrum_df, ["Shift"])
+    assert helpers.sorted_columns(spectrum_df) is index
+
+    selected = index.select({"Shift": (4.0, 2.0), "Intensity": (0.0, None)})
+    expected = np.flatnonzero(spectrum_df["Shift"].between(2.0, 4.0)
+                              & (spectrum_df["Intensity"] >= 0.0))
+    assert np.array_equal(selected, expected)
+
+    # A triangle over (2, 0), (4, 0) and (4, 1) holds the rows below its
+    # hypotenuse.
+    selected = index.select_polygon("Shift", "Intensity",
+                                    [2.0, 4.0, 4.0], [0.0, 0.0, 1.0])
+    shift, intensity = spectrum_df["Shift"], spectrum_df["Intensity"]
+    expected = np.flatnonzero((shift > 2.0) & (shift < 4.0)
+                              & (intensity > 0.0)
+                              & (intensity < (shift - 2.0) / 2.0))
+    assert len(selected) > 0
+    assert np.array_equal(selected, expected)
+
+    # The index does not keep its own data frame alive.
+    data_frame = spectrum_df.copy()
+    helpers.sorted_columns(data_frame, ["Shift"])
+    reference = weakref.ref(data_frame)
+    del data_frame
+    gc.collect()
+    assert reference() is None
+
+
+def test_filter_controls(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    main_df, _, _ = chemmd.io.prepare_nodes_for_bokeh(
+        x_groups, y_groups, [sipos_drupal_node])
+    filter_controls = helpers.build_filter_controls(
+        x_groups, y_groups, chemmd.io.column_profile(main_df))
+
+    column = "Total Aluminate Concentration"
+    slider = filter_controls[column]
+    assert helpers.filter_mask(main_df, column, slider) is None
+    slider.value = (slider.start, main_df[column].median())
+    mask = helpers.filter_mask(main_df, column, slider)
+    assert np.array_equal(mask, (main_df[column] <= slider.value[1]).to_numpy())
+
+    select = filter_controls["Counter Ion"]
+    assert helpers.filter_mask(main_df, "Counter Ion", select) is None
+    select.value = [select.options[0]]
+    assert helpers.filter_mask(main_df, "Counter Ion", select).any()
+
+
+def test_page_rows(spectrum_df):
+    rows, row_count = helpers.page_rows(spectrum_df, 1, 10,
+                                        sort_column="Intensity",
+                                        ascending=False)
+    expected = spectrum_df["Intensity"].sort_values(ascending=False)
+    assert row_count == len(spectrum_df)
+    assert np.array_equal(spectrum_df["Intensity"].to_numpy()[rows],
+                          expected.to_numpy()[10:20])
+
+    mask = (spectrum_df["Sample"] == "a").to_numpy()
+    rows, row_count = helpers.page_rows(spectrum_df, 0, 10, mask=mask)
+    assert row_count == 500
+    assert (spectrum_df["Sample"].iloc[rows] == "a").all()
+
+
+def test_project_columns(spectrum_df):
+    positions = np.array([5, 2, 9])
+    source = bokeh.models.ColumnDataSource(data=helpers.column_data(
+        spectrum_df, ["Shift"], positions))
+    assert set(source.data) == {"index", "Shift"}
+
+    helpers.project_columns(source, spectrum_df, ["Shift", "Intensity"])
+    assert set(source.data) == {"index", "Shift", "Intensity"}
+    assert np.array_equal(source.data["Intensity"],
+                          spectrum_df["Intensity"].to_numpy()[positions])
+
+
+# ----------------------------------------------------------------------------
+# Export Tests
+# ----------------------------------------------------------------------------
+def test_csv_export(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    main_df, metadata_df, metadata_dict = chemmd.io.prepare_nodes_for_bokeh(
+        x_groups, y_groups, [sipos_drupal_node])
+    url = export.register_export(main_df, metadata_df, metadata_dict,
+                                 bokeh.document.Document())
+    session_export = export.EXPORTS[url.rsplit("/", 1)[1]]
+
+    text = b"".join(export.csv_chunks(session_export, include_metadata=True,
+                                      chunk_rows=7)).decode("utf-8")
+    exported = pd.read_csv(io.StringIO(text))
+    assert len(exported) == len(main_df)
+    assert list(exported.columns) == list(main_df.columns) \
+        + list(export.METADATA_NAMES)
+    assert np.allclose(exported["27 Al ppm"], main_df["27 Al ppm"])
+    assert exported["experiment"].notna().all()
+
+    export.forget_session(session_export.session_id)
+    assert session_export not in export.EXPORTS.values()
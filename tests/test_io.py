@@ -7,8 +7,18 @@
 # ----------------------------------------------------------------------------
 import logging
 
+import numpy as np
+import pandas as pd
+
+import chemmd.io.cache
+import chemmd.io.fingerprints
 import chemmd.io.output
-from chemmd.models.nodal import Node
+import chemmd.io.transforms
+import chemmd.io.units
+from chemmd.demos import loaders
+from chemmd.models.core import (DerivedGroup, Factor, QueryGroup,
+                                ScalarColumn)
+from chemmd.models.nodal import Experiment, Node
 
 logger = logging.getLogger(__name__)
 
@@ -33,3 +43,311 @@ def test_export_by_groups(sipos_drupal_node, nmr_groups):
 
     for mapping in group_maps:
         assert len(mapping) == len(groups)
+
+
+def test_assemble_columns():
+    parts = [{"a": [1.0, 2.0], "b": ScalarColumn("x", 2)},
+             {"a": ScalarColumn(3.0, 3), "c": [["Na+"], ["K+"], ["Li+"]]}]
+    expected = pd.concat([pd.DataFrame({key: list(values)
+                                        for key, values in part.items()})
+                          for part in parts], sort=False)
+    expected = expected.reset_index(drop=True)
+
+    frame = chemmd.io.output.assemble_columns(parts)
+    pd.testing.assert_frame_equal(frame, expected)
+
+
+def test_compact_columns():
+    frame = pd.DataFrame({"a": [0.005, 1.5, np.nan],
+                          "b": [1e-3, 2.0 ** 40 + 1, 3.0],
+                          "c": [["Na+"], ["K+"], ["Na+"]],
+                          "d": [1, 2, 3]})
+
+    compact = chemmd.io.output.compact_columns(frame)
+    assert compact["a"].dtype == np.float32
+    # Integers beyond 2 ** 24 would not be kept exactly.
+    assert compact["b"].dtype == np.float64
+    assert compact["c"].cat.categories.tolist() == ["K+", "Na+"]
+    assert compact["c"].tolist() == ["Na+", "K+", "Na+"]
+    assert compact["d"].dtype == frame["d"].dtype
+    np.testing.assert_allclose(compact["a"], frame["a"], rtol=1e-6)
+
+    kept = chemmd.io.output.compact_columns(frame, float32=False,
+                                            categorical=False)
+    assert kept["a"].dtype == np.float64
+    assert not isinstance(kept["c"].dtype, pd.CategoricalDtype)
+
+
+def test_prepare_nodes_for_bokeh(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    main_df, metadata_df, metadata_dict = \
+        chemmd.io.output.prepare_nodes_for_bokeh(x_groups, y_groups,
+                                                 [sipos_drupal_node])
+
+    assert list(main_df.columns) == [group.column_name
+                                     for group in x_groups + y_groups]
+    assert list(metadata_df.columns) == list(main_df.columns)
+    assert len(main_df) == len(metadata_df)
+    assert metadata_df.codes.dtypes.eq("int32").all()
+    assert all(key in metadata_dict
+               for keys in metadata_df.resolve([0])[0] for key in keys if key)
+
+    # Rows sharing their metadata are collapsed, in order of selection.
+    rows = list(range(len(main_df))) * 2
+    distinct = metadata_df.resolve_distinct(rows)
+    assert len(distinct) == len({tuple(row) for row in metadata_df.resolve(rows)})
+    assert (distinct[0] == metadata_df.resolve([0])[0]).all()
+
+
+def test_prepare_files_for_bokeh_cache(nmr_groups):
+    x_groups, y_groups = nmr_groups
+    paths = [loaders.json_demo_path(loaders.JSON_DEMOS["SIPOS_NMR"])]
+    cache = chemmd.io.cache.SessionDataCache(max_bytes=2 ** 30)
+
+    first = chemmd.io.prepare_files_for_bokeh(x_groups, y_groups, paths,
+                                              cache=cache)
+    second = chemmd.io.prepare_files_for_bokeh(list(x_groups), y_groups,
+                                               paths, cache=cache)
+    assert len(cache) == 1
+    pd.testing.assert_frame_equal(second[0], first[0])
+    assert second[2] is first[2]
+
+    # Each session is given its own copy of the cached frames.
+    first[0]["Derived"] = 1.0
+    first[1].codes = first[1].codes.iloc[:0]
+    assert "Derived" not in second[0]
+    assert len(second[1]) == len(second[0])
+
+    # Adding a larger result than the remaining budget evicts the first.
+    cache.max_bytes = cache.current_bytes + 1
+    cache.put("other", None, cache.current_bytes)
+    assert len(cache) == 1 and "other" in cache
+
+
+def test_metadata_table_extend():
+    keys = pd.DataFrame([("e0", None, None)],
+                        columns=chemmd.io.output.METADATA_LEVELS,
+                        dtype=object)
+    table = chemmd.io.MetadataTable(
+        codes=pd.DataFrame({"a": [0]}, dtype="int32"), keys=keys)
+    first_codes = table.codes
+
+    for code in range(1, 100):
+        batch_keys = pd.DataFrame([(f"e{code}", None, None)],
+                                  columns=keys.columns, dtype=object,
+                                  index=[code])
+        table.extend(chemmd.io.MetadataTable(
+            codes=pd.DataFrame({"a": [code, -1]}, dtype="int32"),
+            keys=batch_keys))
+
+    assert len(table) == 199 and len(table.keys) == 100
+    assert table.codes["a"].tolist()[-2:] == [99, -1]
+    assert table.resolve([197])[0][0] == ("e99", None, None)
+    # Rows are written into a buffer, earlier frames are left unchanged.
+    assert len(first_codes) == 1
+    assert len(table._code_buffer) < 2 * len(table)
+
+
+def test_key_table_across_extends():
+    key_codes = {("e0", None, None): 0}
+    table = chemmd.io.MetadataTable(
+        codes=pd.DataFrame({"a": [0]}, dtype="int32"),
+        keys=chemmd.io.output.key_table(key_codes))
+
+    for batch in (("e1", "e2"), ("e3", )):
+        start = len(key_codes)
+        for name in batch:
+            key_codes[(name, None, None)] = len(key_codes)
+        table.extend(chemmd.io.MetadataTable(
+            codes=pd.DataFrame({"a": list(range(start, len(key_codes)))},
+                               dtype="int32"),
+            keys=chemmd.io.output.key_table(key_codes, start=start)))
+
+    assert table.keys.index.tolist() == [0, 1, 2, 3]
+    assert [keys[0][0] for keys in table.resolve([0, 1, 2, 3])] \
+        == ["e0", "e1", "e2", "e3"]
+
+
+def test_fingerprints(tmp_path):
+    datafile = tmp_path / "data.csv"
+    datafile.write_text("a\n1.0\n")
+    before = chemmd.io.fingerprints.datafile_fingerprint(
+        "data.csv", base_path=str(tmp_path), mode="LOCAL")
+    datafile.write_text("a\n20.0\n")
+    after = chemmd.io.fingerprints.datafile_fingerprint(
+        "data.csv", base_path=str(tmp_path), mode="LOCAL")
+    assert before != after
+
+    # Derived groups are told apart by their code, not their name.
+    groups = [DerivedGroup("Ratio", ("a", "b"), lambda a, b: a / b)]
+    other = [DerivedGroup("Ratio", ("a", "b"), lambda a, b: a * b)]
+    assert chemmd.io.fingerprints.groups_fingerprint(groups, []) \
+        != chemmd.io.fingerprints.groups_fingerprint(other, [])
+
+
+def test_stream_nodes_for_bokeh(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    main_df, metadata_df, _ = chemmd.io.output.prepare_nodes_for_bokeh(
+        x_groups, y_groups, [sipos_drupal_node])
+    batches = list(chemmd.io.output.stream_nodes_for_bokeh(
+        x_groups, y_groups, [sipos_drupal_node]))
+
+    streamed_df = pd.concat([batch_df for batch_df, _, _ in batches])
+    # Streamed discrete columns are strings rather than categoricals.
+    pd.testing.assert_frame_equal(streamed_df, main_df, check_dtype=False,
+                                  check_categorical=False)
+
+    streamed_metadata = batches[0][1]
+    for _, batch_metadata, _ in batches[1:]:
+        streamed_metadata.extend(batch_metadata)
+    rows = list(range(len(main_df)))
+    assert (streamed_metadata.resolve(rows) == metadata_df.resolve(rows)).all()
+
+
+def test_prepare_nodes_in_pool(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    nodes = [sipos_drupal_node, loaders.node_demo_by_key("SIPOS_NMR_2")]
+    serial = chemmd.io.output.prepare_nodes_for_bokeh(x_groups, y_groups,
+                                                      nodes)
+    pooled = chemmd.io.output.prepare_nodes_for_bokeh(x_groups, y_groups,
+                                                      nodes, processes=2)
+
+    pd.testing.assert_frame_equal(pooled[0], serial[0])
+    pd.testing.assert_frame_equal(pooled[1].codes, serial[1].codes)
+    pd.testing.assert_frame_equal(pooled[1].keys, serial[1].keys)
+    assert all(pooled[2][key] is serial[2][key] for key in serial[2])
+
+    # The worker pool is started once and re-used.
+    pool = chemmd.io.output.worker_pool(2)
+    chemmd.io.output.prepare_nodes_for_bokeh(x_groups, y_groups, nodes,
+                                             processes=2)
+    assert chemmd.io.output.worker_pool(2) is pool
+
+
+def test_apply_transforms(tmp_path):
+    datafile = tmp_path / "transform.csv"
+    datafile.write_text("a\n1.0\n2.0\n3.0\n")
+    group = QueryGroup("Al Concentration", ("Molar",), ("Al",))
+    factor = Factor("Measurement Condition", unit_reference="Molar",
+                    csv_column_index=0)
+    experiment = Experiment(name="Transform test", datafile=str(datafile))
+    grouping_dict = {"factor": factor, "experiment": experiment,
+                     "factor_data": [1.0, 2.0, 3.0],
+                     "species_map": {"Al2O3": 2.0}, "species_keys": ["Al2O3"]}
+
+    transformed = chemmd.io.transforms.apply_transforms({group: grouping_dict})
+    assert transformed[group]["factor_data"].tolist() == [2.0, 4.0, 6.0]
+    assert grouping_dict["factor_data"] == [1.0, 2.0, 3.0]
+
+    # The same datafile column and transform is read from the cache.
+    again = chemmd.io.transforms.apply_transforms({group: grouping_dict})
+    assert again[group]["factor_data"] is transformed[group]["factor_data"]
+
+    # A changed datafile is transformed again.
+    datafile.write_text("a\n10.0\n20.0\n30.0\n")
+    grouping_dict["factor_data"] = [10.0, 20.0, 30.0]
+    changed = chemmd.io.transforms.apply_transforms({group: grouping_dict})
+    assert changed[group]["factor_data"].tolist() == [20.0, 40.0, 60.0]
+
+    grouping_dict["factor_data"] = ScalarColumn(0.5, 3)
+    transformed = chemmd.io.transforms.apply_transforms({group: grouping_dict})
+    assert transformed[group]["factor_data"] == ScalarColumn(1.0, 3)
+
+
+def test_stoichiometry_in_columns(sipos_drupal_node, nmr_groups):
+    x_groups, y_groups = nmr_groups
+    experiment = sipos_drupal_node.experiments[0]
+    group_mapping = chemmd.io.output.create_group_mapping(
+        experiment.species_factor_mapping(sipos_drupal_node),
+        x_groups + y_groups)
+    data, _, _ = chemmd.io.output.group_mapping_as_columns(group_mapping)
+
+    # A counter ion with a stoichiometry of two doubles its concentration.
+    group = x_groups[1]
+    group_mapping[group] = {**group_mapping[group],
+                            "species_map": {"K+": 2.0, "OH-": 1.0}}
+    doubled, _, _ = chemmd.io.output.group_mapping_as_columns(group_mapping)
+
+    np.testing.assert_allclose(doubled[group.column_name],
+                               2 * data[group.column_name])
+    # Other groups keep their own stoichiometry.
+    assert doubled[x_groups[0].column_name] == data[x_groups[0].column_name]
+
+
+def test_normalize_units():
+    assert chemmd.io.units.conversion("mM", "Molar") == (1e-3, 0.0)
+    assert chemmd.io.units.conversion("Molal", "Molar") is None
+
+    group = QueryGroup("Temperature", ("Kelvin",), ("Al",))
+    factor = Factor("Measurement Condition", decimal_value=25.0,
+                    unit_reference="Celsius")
+    assert chemmd.io.output.factor_matches(factor, group.factor_filters)
+
+    grouping_dict = {"factor": factor, "factor_data": ScalarColumn(25.0, 2)}
+    normalized = chemmd.io.units.normalize_units({group: grouping_dict})
+    assert normalized[group]["factor"].unit_reference == "Kelvin"
+    assert normalized[group]["factor_data"] == ScalarColumn(298.15, 2)
+    assert grouping_dict["factor"].unit_reference == "Celsius"
+
+    kelvin = {"factor": normalized[group]["factor"], "factor_data": [1.0]}
+    assert chemmd.io.units.normalize_units({group: kelvin})[group] is kelvin
+
+    # The other filter terms must also match the factor.
+    assert chemmd.io.units.conversion_target(
+        factor, ("Measurement Condition", "Kelvin")) == "Kelvin"
+    assert not chemmd.io.output.factor_matches(factor, ("Purity", "Kelvin"))
+
+
+def test_aggregate_session_data():
+    main_df = pd.DataFrame({"x": [0.0, 0.1, 0.9, 1.0, np.nan],
+                            "ion": [["Na+"], ["Na+"], ["Na+"], ["K+"], ["K+"]],
+                            "y": [1.0, 3.0, 5.0, 7.0, 9.0]})
+    codes = pd.DataFrame({"x": [0, 0, 1, 1, 1], "ion": [0, 0, 1, 1, 1],
+                          "y": [0, 1, 1, 1, 1]}, dtype="int32")
+    keys = pd.DataFrame([("a", None, None), ("b", None, None)],
+                        columns=chemmd.io.output.METADATA_LEVELS)
+    metadata_df = chemmd.io.MetadataTable(codes=codes, keys=keys)
+
+    summary, summary_metadata = chemmd.io.aggregate_session_data(
+        main_df, metadata_df, chemmd.io.Aggregation("x", by="ion", bins=2),
+        y_columns=["y"])
+
+    assert summary["x"].tolist() == [0.25, 0.75, 0.75]
+    assert summary["ion"].tolist() == ["Na+", "K+", "Na+"]
+    assert summary["y"].tolist() == [2.0, 7.0, 5.0]
+    assert summary["y count"].tolist() == [2, 1, 1]
+    assert summary["y upper"][0] == 2.0 + np.std([1.0, 3.0], ddof=1)
+    assert summary_metadata.codes["y"].tolist() == [-1, 1, 1]
+    assert summary_metadata.codes["x"].tolist() == [0, 1, 1]
+
+
+def test_column_profile():
+    main_df = pd.DataFrame({"x": [3.0, 1.0, np.nan, 2.0],
+                            "ion": [["Na+"], ["K+"], ["Na+"], None]})
+    profile = chemmd.io.column_profile(main_df)
+
+    assert profile["x"].dtype_class == "continuous"
+    assert (profile["x"].minimum, profile["x"].maximum) == (1.0, 3.0)
+    assert profile["x"].quantiles[2] == 2.0
+    assert profile["ion"].dtype_class == "discrete"
+    assert profile["ion"].categories == ("K+", "Na+")
+
+    # Profiles are kept with the frame, new columns are added to them.
+    main_df["y"] = main_df["x"] * 2
+    assert chemmd.io.column_profile(main_df, ["x"])["x"] is profile["x"]
+    assert chemmd.io.column_profile(main_df)["y"].maximum == 6.0
+
+
+def test_combine_profiles():
+    first = chemmd.io.column_profile(pd.DataFrame(
+        {"x": [3.0, 1.0], "ion": ["Na+", "Na+"], "empty": [np.nan] * 2}))
+    second = chemmd.io.column_profile(pd.DataFrame(
+        {"x": [5.0, np.nan], "ion": ["K+", None], "empty": [4.0, 2.0]}))
+    combined = {column: chemmd.io.combine_profiles(first[column],
+                                                   second[column])
+                for column in first}
+
+    assert (combined["x"].minimum, combined["x"].maximum) == (1.0, 5.0)
+    assert combined["ion"].categories == ("K+", "Na+")
+    assert combined["ion"].cardinality == 2
+    assert combined["empty"] == second["empty"]
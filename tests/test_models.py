@@ -7,7 +7,7 @@
 # ----------------------------------------------------------------------------
 import logging
 
-from chemmd.models.core import Factor, SpeciesFactor, Comment
+from chemmd.models.core import Factor, SpeciesFactor, Comment, ScalarColumn
 from chemmd.models.nodal import Node, Sample, Source, Experiment
 
 logger = logging.getLogger(__name__)
@@ -38,6 +38,18 @@ def test_comment_creation(comment_kwargs):
         assert comment.comment_body == kwargs["comment_body"]
 
 
+def test_scalar_column():
+    column = ScalarColumn(18.0, 4)
+    assert len(column) == 4
+    assert list(column) == [18.0] * 4
+    assert column.as_array().tolist() == [18.0] * 4
+    assert column.resized(2).as_array().tolist() == [18.0] * 2
+
+    species = ScalarColumn(["Na+"], 3).as_array()
+    assert species.dtype == object
+    assert species.tolist() == [["Na+"]] * 3
+
+
 # ----------------------------------------------------------------------------
 # Test nodal model initialization.
 # ----------------------------------------------------------------------------
@@ -76,3 +88,19 @@ def test_build_factor_map(sipos_drupal_node):
     # We should have the same number of mappings and experiments.
     assert len(maps) == 4
 
+
+def test_factor_map_priority(sipos_drupal_node):
+    experiment = sipos_drupal_node.experiments[0]
+    mapping = experiment.species_factor_mapping(sipos_drupal_node)
+
+    # The purity of the aluminium source is also a factor of the sample
+    # that contains it, so the key is in a sample and a source layer.
+    key = (("Al(III)",), ("Material Property", "Percent",
+                          "Purity by Weight"))
+    layers = [layer for layer in mapping.maps if key in layer]
+    assert len(layers) == 2
+    assert "sample" in layers[0][key] and "source" not in layers[0][key]
+    assert "source" in layers[1][key]
+
+    # The sample layer overrides the source layer.
+    assert mapping[key] is layers[0][key]